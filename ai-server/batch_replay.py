@@ -0,0 +1,153 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from script import analyze_rgb
+from session_aggregator import SessionAggregator
+from session_state import SessionState
+
+# re-score recorded interviews offline with the same pipeline as the /ws handler
+#
+#   python batch_replay.py recordings/*.mp4 --output results/2024-05-01
+#   python batch_replay.py frames/session-1/ frames/session-2/ --frame-fps 10 --workers 8
+#
+# every video file (or directory of frame images) is one session, replayed in its own process:
+# decode -> FaceMesh -> eye/head/mouth classification with the same smoothing, calibration and
+# aggregation as a live session, timed by the video timestamps instead of the wall clock.
+# writes <output>_frames and <output>_sessions as parquet (needs pyarrow) or csv.
+
+REPLAY_FPS = 10.0 # the browser client sends one frame every 100 ms, replay at the same rate
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+FRAME_COLUMNS = [
+    "source", "frame", "time", "eye_direction", "head_direction", "smoothed_horizontal", "smoothed_vertical",
+    "center_horizontal", "center_vertical", "mouth_opening_percent", "mouth_state", "progress", "error",
+]
+
+# (time in seconds, bgr frame) of a video, keeping at most fps frames per second (0: every frame)
+def iter_video_frames(path, fps=REPLAY_FPS):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"cannot open video {path}")
+    video_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    next_time = 0.0
+    try:
+        while True:
+            ok, bgr = capture.read()
+            if not ok:
+                break
+            t = index / video_fps
+            index += 1
+            if fps and t + 1e-6 < next_time:
+                continue
+            next_time += 1 / fps if fps else 0
+            yield t, bgr
+    finally:
+        capture.release()
+
+# (time in seconds, bgr frame) of a directory of images captured at frame_fps
+def iter_image_frames(directory, frame_fps=REPLAY_FPS, fps=REPLAY_FPS):
+    paths = sorted(path for path in glob.glob(os.path.join(directory, "*")) if path.lower().endswith(IMAGE_EXTENSIONS))
+    next_time = 0.0
+    for index, path in enumerate(paths):
+        t = index / frame_fps
+        if fps and t + 1e-6 < next_time:
+            continue
+        next_time += 1 / fps if fps else 0
+        bgr = cv2.imread(path)
+        if bgr is not None:
+            yield t, bgr
+
+def frame_row(source, index, t, response):
+    row = {column: response.get(column) for column in FRAME_COLUMNS}
+    row.update(source=source, frame=index, time=round(t, 3), error=response.get("error") or response.get("detail"))
+    return row
+
+# replay one session, runs in a worker process
+def replay_source(source, fps=REPLAY_FPS, frame_fps=REPLAY_FPS):
+    cv2.setNumThreads(1) # one process per core already
+    frames = iter_image_frames(source, frame_fps, fps) if os.path.isdir(source) else iter_video_frames(source, fps)
+
+    state = SessionState(source, now=0.0)
+    state.aggregator = SessionAggregator(source)
+    rows = []
+    for index, (t, bgr) in enumerate(frames):
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=bgr)
+        response = analyze_rgb(source, state, rgb, now=t)
+        state.aggregator.update(response, now=t)
+        rows.append(frame_row(source, index, t, response))
+    return rows, state.aggregator.summary()
+
+# flat session row, nested summary fields are stored as json strings
+def session_row(source, summary):
+    row = {"source": source}
+    for key, value in summary.items():
+        row[key] = json.dumps(value) if isinstance(value, (dict, list)) else value
+    return row
+
+# write rows as <path_base>.parquet (pyarrow) or <path_base>.csv, returns the written path
+def write_table(rows, path_base, columns=None, file_format="parquet"):
+    columns = columns or (list(rows[0]) if rows else [])
+    if file_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("[batch_replay] pyarrow is not installed, writing csv instead")
+        else:
+            path = path_base + ".parquet"
+            table = pa.Table.from_pylist(rows) if rows else pa.table({column: [] for column in columns})
+            pq.write_table(table, path)
+            return path
+
+    path = path_base + ".csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+def replay(sources, workers=None, fps=REPLAY_FPS, frame_fps=REPLAY_FPS):
+    frame_rows, session_rows, failed = {}, {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(replay_source, source, fps, frame_fps): source for source in sources}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                rows, summary = future.result()
+            except Exception as e:
+                print(f"[batch_replay] {source} failed: {e}")
+                failed.append(source)
+                continue
+            frame_rows[source] = rows
+            session_rows[source] = session_row(source, summary)
+            print(f"[batch_replay] {source}: {len(rows)} frames")
+
+    # keep the input order regardless of which worker finished first
+    ordered = [source for source in sources if source in frame_rows]
+    return [row for source in ordered for row in frame_rows[source]], [session_rows[source] for source in ordered], failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded interview sessions through the facial-analysis pipeline")
+    parser.add_argument("sources", nargs="+", help="video files or directories of frame images (one session each)")
+    parser.add_argument("--output", default="replay", help="output path prefix (default: ./replay)")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="parquet needs pyarrow, falls back to csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--fps", type=float, default=REPLAY_FPS, help="frames analyzed per second of video like the live client (0: every frame)")
+    parser.add_argument("--frame-fps", type=float, default=REPLAY_FPS, help="capture rate of frame directories")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    frames, sessions, failed = replay(args.sources, args.workers, args.fps, args.frame_fps)
+    frames_path = write_table(frames, args.output + "_frames", FRAME_COLUMNS, args.format)
+    sessions_path = write_table(sessions, args.output + "_sessions", None, args.format)
+    seconds = time.perf_counter() - started
+
+    print(f"Replayed {len(sessions)} sessions ({len(frames)} frames) in {seconds:.1f}s "
+          f"({len(frames) / seconds:.1f} frames/s), {len(failed)} failed -> {frames_path}, {sessions_path}")
@@ -0,0 +1,138 @@
+import argparse
+import base64
+import glob
+import os
+import time
+import cv2
+import numpy as np
+import common
+from face_pool import create_face_mesh
+from facial_metrics import NUM_LANDMARKS, PoseTracker, landmarks_to_array, compute_eye_ratios, compute_head_direction, compute_mouth_opening
+from frame_preprocessing import FramePreprocessor
+from script import decode_base64_to_bgr
+
+# push frames through the facial-analysis hot path, timing every stage:
+#   decode    - base64 data url -> bgr (decode_base64_to_bgr) -> rgb
+#   face_mesh - face_mesh.process (or FramePreprocessor.detect with --preprocess)
+#   metrics   - compute_eye_ratios, compute_head_direction (PoseTracker with --track-pose), compute_mouth_opening
+#
+#   python benchmarks/bench_facial.py --frames 300                  # synthetic 640x480 frames
+#   python benchmarks/bench_facial.py --source recording.mp4        # recorded video
+#   python benchmarks/bench_facial.py --source frames/ --preprocess # directory of images
+#
+# synthetic frames contain no face, so the metrics stage runs on the last detected landmarks or,
+# when nothing was ever detected, on a fixed synthetic landmark set (timings are still representative).
+
+# jpeg data urls, the same encoding the browser client used to send
+def to_data_url(bgr, quality=80):
+    ok, jpg = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return "data:image/jpeg;base64," + base64.b64encode(jpg.tobytes()).decode("ascii")
+
+# deterministic noise frames with a bright ellipse, roughly webcam sized
+def synthetic_frames(count, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        center = (width // 2 + (i % 20) - 10, height // 2)
+        cv2.ellipse(frame, center, (width // 6, height // 4), 0, 0, 360, (180, 200, 230), -1)
+        frames.append(to_data_url(frame))
+    return frames
+
+# frames from a video file or a directory of images
+def recorded_frames(source, limit=None):
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith((".jpg", ".jpeg", ".png")))
+        images = (cv2.imread(path) for path in paths)
+    else:
+        capture = cv2.VideoCapture(source)
+        def read_video():
+            while True:
+                ok, image = capture.read()
+                if not ok:
+                    break
+                yield image
+            capture.release()
+        images = read_video()
+
+    frames = []
+    for image in images:
+        if image is None:
+            continue
+        frames.append(to_data_url(image))
+        if limit and len(frames) >= limit:
+            break
+    return frames
+
+def synthetic_landmarks(seed=0):
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(0.3, 0.7, (NUM_LANDMARKS, 3)).astype(np.float32)
+    landmarks[:, 2] = rng.uniform(-0.05, 0.05, NUM_LANDMARKS)
+    return landmarks
+
+def run(frames, preprocess=False, track_pose=False):
+    face_mesh = create_face_mesh()
+    preprocessor = FramePreprocessor() if preprocess else None
+    head_direction = PoseTracker().update if track_pose else compute_head_direction
+    stages = {"decode": [], "face_mesh": [], "metrics": [], "total": []}
+    faces_detected = 0
+    landmarks = synthetic_landmarks()
+
+    with common.Timer() as timer:
+        for data_url in frames:
+            start = time.perf_counter()
+            bgr = decode_base64_to_bgr(data_url)
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            decoded = time.perf_counter()
+
+            if preprocessor is not None:
+                detected = preprocessor.detect(face_mesh, rgb)
+            else:
+                results = face_mesh.process(rgb)
+                detected = landmarks_to_array(results.multi_face_landmarks[0]) if results.multi_face_landmarks else None
+            if detected is not None:
+                faces_detected += 1
+                landmarks = detected
+            meshed = time.perf_counter()
+
+            h, w = rgb.shape[:2]
+            compute_eye_ratios(landmarks, w, h)
+            head_direction(landmarks, w, h)
+            compute_mouth_opening(landmarks, w, h)
+            end = time.perf_counter()
+
+            stages["decode"].append(decoded - start)
+            stages["face_mesh"].append(meshed - decoded)
+            stages["metrics"].append(end - meshed)
+            stages["total"].append(end - start)
+
+    face_mesh.close()
+    return stages, timer.seconds, faces_detected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark decode -> face mesh -> facial metrics per frame")
+    parser.add_argument("--source", help="video file or directory of images (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=200, help="number of frames (synthetic) or max frames (recorded)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--preprocess", action="store_true", help="downscale/crop with FramePreprocessor like the websocket server")
+    parser.add_argument("--track-pose", action="store_true", help="head pose through a PoseTracker like the websocket server")
+    parser.add_argument("--output", help="also write the json report to this file")
+    args = parser.parse_args()
+
+    frames = recorded_frames(args.source, args.frames) if args.source else synthetic_frames(args.frames, args.width, args.height)
+    if not frames:
+        parser.error(f"no frames could be read from {args.source}")
+
+    stages, seconds, faces_detected = run(frames, args.preprocess, args.track_pose)
+    report = common.make_report(
+        "facial", stages["total"], seconds, len(frames),
+        latency_unit="frame",
+        source=args.source or f"synthetic {args.width}x{args.height}",
+        preprocess=args.preprocess,
+        track_pose=args.track_pose,
+        faces_detected=faces_detected,
+        stages={name: common.latency_stats(values) for name, values in stages.items() if name != "total"},
+    )
+    common.write_report(report, args.output)
@@ -0,0 +1,54 @@
+import argparse
+import time
+import common
+from check_encoder_backends import dataset_answers
+import encoder
+import keypoint_detection as key_det
+
+# replay every possible_answers entry of the bundled datasets through keypoint detection
+#
+#   python benchmarks/bench_keypoints.py                    # one detect_keypoints call per answer
+#   python benchmarks/bench_keypoints.py --batch-size 32    # detect_keypoints_batch, latency per batch
+#   python benchmarks/bench_keypoints.py --repeat 3 --output keypoints.json
+
+def run(items, batch_size=0, repeat=1):
+    latencies = []
+    with common.Timer() as timer:
+        for _ in range(repeat):
+            if batch_size <= 0:
+                for item in items:
+                    start = time.perf_counter()
+                    key_det.detect_keypoints(item)
+                    latencies.append(time.perf_counter() - start)
+            else:
+                for offset in range(0, len(items), batch_size):
+                    start = time.perf_counter()
+                    key_det.detect_keypoints_batch(items[offset:offset + batch_size])
+                    latencies.append(time.perf_counter() - start)
+    return latencies, timer.seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keypoint detection over the dataset answers")
+    parser.add_argument("--batch-size", type=int, default=0, help="answers per detect_keypoints_batch call (0: one call per answer)")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the dataset")
+    parser.add_argument("--limit", type=int, help="only the first N answers")
+    parser.add_argument("--output", help="also write the json report to this file")
+    args = parser.parse_args()
+
+    items = dataset_answers()[:args.limit]
+
+    # model load and first inference are reported separately, not mixed into the latencies
+    with common.Timer() as warm_up:
+        key_det.warm_up()
+        key_det.detect_keypoints(items[0])
+
+    latencies, seconds = run(items, args.batch_size, args.repeat)
+    report = common.make_report(
+        "keypoints", latencies, seconds, len(items) * args.repeat,
+        latency_unit="batch" if args.batch_size > 0 else "answer",
+        batch_size=args.batch_size,
+        encoder_backend=encoder.ENCODER_BACKEND,
+        warm_up_seconds=round(warm_up.seconds, 3),
+    )
+    common.write_report(report, args.output)
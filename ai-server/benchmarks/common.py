@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+# shared helpers for the benchmarks: offline/cpu setup, latency percentiles, peak rss and the json report
+#
+# every benchmark prints one json report (or writes it with --output) so runs on different commits
+# can be diffed or compared by a script.
+
+AI_SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(AI_SERVER_DIR, "util", "question_dataset")
+
+# benchmarks never touch the network or a gpu (models must already be in the local cache)
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+# make the ai-server modules importable when a benchmark is run as a script
+if AI_SERVER_DIR not in sys.path:
+    sys.path.insert(0, AI_SERVER_DIR)
+
+# nearest-rank percentile of an already sorted list
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+# p50/p95/p99/mean/max of latencies given in seconds, reported in milliseconds
+def latency_stats(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(1000 * sum(values) / len(values), 3),
+        "p50_ms": round(1000 * percentile(values, 50), 3),
+        "p95_ms": round(1000 * percentile(values, 95), 3),
+        "p99_ms": round(1000 * percentile(values, 99), 3),
+        "max_ms": round(1000 * values[-1], 3),
+    }
+
+# peak resident set size of this process in megabytes (ru_maxrss is kB on linux, bytes on macos)
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+# peak rss of another process (e.g. the server under load), linux only
+def process_peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=AI_SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# wall clock timer for a whole run
+class Timer:
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+
+# common report envelope: what ran, where, and the measured numbers
+def make_report(name, latencies, seconds, items, **extra):
+    return {
+        "benchmark": name,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "items": items,
+        "seconds": round(seconds, 3),
+        "throughput_per_second": round(items / seconds, 2) if seconds else None,
+        "latency": latency_stats(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+        **extra,
+    }
+
+def write_report(report, output=None):
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+    print(text)
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import base64
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from urllib.parse import urlparse
+import websockets
+import common
+from bench_facial import recorded_frames, synthetic_frames
+
+# end-to-end load generator for the websocket server in script.py: N concurrent clients each send
+# frames and wait for the analysis of every frame before sending the next one (closed loop, so the
+# latency is the full round trip and the server's latest-frame slot never drops a frame).
+#
+#   python benchmarks/ws_load.py --spawn --clients 8 --frames 100    # starts script.py itself
+#   python benchmarks/ws_load.py --url ws://127.0.0.1:8000/ws --clients 16 --fps 15 --server-pid 1234
+
+async def run_client(url, frames, count, fps, binary, results):
+    payloads = [base64.b64decode(frame.split(",", 1)[1]) if binary else frame for frame in frames]
+    interval = 1 / fps if fps > 0 else 0
+    session_url = f"{url}?session_id=bench-{uuid.uuid4().hex[:8]}"
+
+    async with websockets.connect(session_url, max_size=None) as websocket:
+        next_send = time.perf_counter()
+        for i in range(count):
+            if interval:
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+                next_send += interval
+            start = time.perf_counter()
+            await websocket.send(payloads[i % len(payloads)])
+            response = await websocket.recv()
+            results["latencies"].append(time.perf_counter() - start)
+            if '"error"' in response:
+                results["errors"] += 1
+
+async def run_load(url, frames, clients, count, fps, binary):
+    results = {"latencies": [], "errors": 0, "failed_clients": 0}
+    outcomes = await asyncio.gather(
+        *(run_client(url, frames, count, fps, binary, results) for _ in range(clients)),
+        return_exceptions=True,
+    )
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            results["failed_clients"] += 1
+            print(f"[ws_load] client failed: {outcome!r}", file=sys.stderr)
+    return results
+
+# start script.py under uvicorn and wait until it accepts connections
+def spawn_server(port):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "script:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=common.AI_SERVER_DIR,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("websocket server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("websocket server did not start within 60s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Websocket load generator for the facial-analysis server")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws")
+    parser.add_argument("--spawn", action="store_true", help="start script.py on the --url port for the run")
+    parser.add_argument("--server-pid", type=int, help="report the peak rss of this server process")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent websocket clients")
+    parser.add_argument("--frames", type=int, default=100, help="frames sent by every client")
+    parser.add_argument("--fps", type=float, default=0, help="max frames per second per client (0: as fast as possible)")
+    parser.add_argument("--base64", action="store_true", help="send base64 data urls like older clients instead of binary jpeg")
+    parser.add_argument("--source", help="video file or directory of images (default: synthetic frames)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--output", help="also write the json report to this file")
+    args = parser.parse_args()
+
+    frames = recorded_frames(args.source, 100) if args.source else synthetic_frames(30, args.width, args.height)
+    if not frames:
+        parser.error(f"no frames could be read from {args.source}")
+
+    server = spawn_server(urlparse(args.url).port or 80) if args.spawn else None
+    server_pid = server.pid if server else args.server_pid
+    try:
+        with common.Timer() as timer:
+            results = asyncio.run(run_load(args.url, frames, args.clients, args.frames, args.fps, not args.base64))
+        server_peak_rss = common.process_peak_rss_mb(server_pid) if server_pid else None
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = common.make_report(
+        "websocket", results["latencies"], timer.seconds, len(results["latencies"]),
+        latency_unit="frame round trip",
+        url=args.url,
+        clients=args.clients,
+        frames_per_client=args.frames,
+        fps=args.fps,
+        encoding="base64" if args.base64 else "binary",
+        error_responses=results["errors"],
+        failed_clients=results["failed_clients"],
+        server_peak_rss_mb=server_peak_rss,
+    )
+    common.write_report(report, args.output)
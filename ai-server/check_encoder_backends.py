@@ -0,0 +1,120 @@
+import argparse
+import sys
+import embedding_index
+import encoder
+import keypoint_detection as key_det
+
+# compare detected/missing keypoints between two encoder backends over every possible_answers
+# entry in the bundled datasets, e.g. before switching production to the quantized onnx model:
+#   python check_encoder_backends.py --baseline torch --candidate onnx --min-agreement 0.98
+#
+# or count the keypoints each confidence rule detects with one backend (KEYPOINT_CONFIDENCE_RULE):
+#   python check_encoder_backends.py --baseline torch --compare-rules
+
+# every (question, possible answer) pair in the datasets, shaped like a /getFeedback request
+def dataset_answers(dataset_dir=embedding_index.DATASET_DIR):
+    items = []
+    for question in embedding_index.iter_dataset_questions(dataset_dir):
+        for answer in question.get("possible_answers", []):
+            items.append({
+                "question_id": question["question_id"],
+                "question_level": question["question_level"],
+                "question": question["question"],
+                "keypoints": question["keypoints"],
+                "user_answer": answer,
+            })
+    return items
+
+# (keypoint embeddings, answer embedding) of every item with one backend, all texts encoded in two batches
+def embed_items(items, backend):
+    answers = encoder.encode([item["user_answer"] for item in items], backend=backend)
+    key_points = sorted({key_point for item in items for key_point in item["keypoints"]})
+    key_point_rows = {key_point: row for row, key_point in enumerate(key_points)}
+    key_point_embeddings = encoder.encode(key_points, backend=backend)
+    return [
+        (key_point_embeddings[[key_point_rows[key_point] for key_point in item["keypoints"]]], answer_embedding)
+        for item, answer_embedding in zip(items, answers)
+    ]
+
+# detected keypoints of every item from its embeddings with one confidence rule
+def detect_items(items, embeddings, rule=None):
+    detected = []
+    for item, (key_point_embeddings, answer_embedding) in zip(items, embeddings):
+        found, _ = key_det.match_keypoints(item, key_point_embeddings, answer_embedding, rule=rule)
+        detected.append(set(found))
+    return detected
+
+def detect_with_backend(items, backend):
+    return detect_items(items, embed_items(items, backend))
+
+def compare_backends(baseline, candidate, dataset_dir=embedding_index.DATASET_DIR):
+    items = [item for item in dataset_answers(dataset_dir) if item["user_answer"].strip()]
+    baseline_detected = detect_with_backend(items, baseline)
+    candidate_detected = detect_with_backend(items, candidate)
+
+    total_key_points = 0
+    agreeing_key_points = 0
+    identical_answers = 0
+    mismatches = []
+    for item, expected, actual in zip(items, baseline_detected, candidate_detected):
+        for key_point in item["keypoints"]:
+            total_key_points += 1
+            agreeing_key_points += (key_point in expected) == (key_point in actual)
+        if expected == actual:
+            identical_answers += 1
+        else:
+            mismatches.append({
+                "question": item["question"],
+                "user_answer": item["user_answer"],
+                "only_" + baseline: sorted(expected - actual),
+                "only_" + candidate: sorted(actual - expected),
+            })
+
+    return {
+        "answers": len(items),
+        "identical_answers": identical_answers,
+        "keypoints": total_key_points,
+        "keypoint_agreement": agreeing_key_points / total_key_points if total_key_points else 1.0,
+        "mismatches": mismatches,
+    }
+
+# detected keypoint counts per confidence rule with one backend, against the first rule (the default one)
+def compare_rules(backend, rules=tuple(key_det.CONFIDENCE_RULES), dataset_dir=embedding_index.DATASET_DIR):
+    items = [item for item in dataset_answers(dataset_dir) if item["user_answer"].strip()]
+    embeddings = embed_items(items, backend)
+    detected = {rule: detect_items(items, embeddings, rule) for rule in rules}
+
+    baseline = detected[rules[0]]
+    report = {"answers": len(items), "keypoints": sum(len(item["keypoints"]) for item in items), "rules": {}}
+    for rule in rules:
+        report["rules"][rule] = {
+            "detected": sum(len(found) for found in detected[rule]),
+            "changed_answers": sum(found != expected for found, expected in zip(detected[rule], baseline)),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare keypoint detection between encoder backends")
+    parser.add_argument("--baseline", default="torch", choices=sorted(encoder.BACKENDS))
+    parser.add_argument("--candidate", default="onnx", choices=sorted(encoder.BACKENDS))
+    parser.add_argument("--dataset-dir", default=embedding_index.DATASET_DIR)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--compare-rules", action="store_true", help="count detected keypoints per confidence rule with --baseline")
+    args = parser.parse_args()
+
+    if args.compare_rules:
+        report = compare_rules(args.baseline, dataset_dir=args.dataset_dir)
+        print(f"answers: {report['answers']}, keypoints: {report['keypoints']}, "
+              f"threshold: {key_det.SIMILARITY_THRESHOLD}")
+        for rule, counts in report["rules"].items():
+            print(f"{rule}: {counts['detected']} detected, {counts['changed_answers']} answers differ from {next(iter(report['rules']))}")
+        sys.exit(0)
+
+    report = compare_backends(args.baseline, args.candidate, args.dataset_dir)
+    for mismatch in report["mismatches"]:
+        print(mismatch)
+    print(f"answers: {report['answers']}, identical: {report['identical_answers']}, "
+          f"keypoint agreement: {report['keypoint_agreement']:.4f}")
+
+    sys.exit(0 if report["keypoint_agreement"] >= args.min_agreement else 1)
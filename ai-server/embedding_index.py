@@ -0,0 +1,246 @@
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import encoder
+
+# precomputed embedding index for the fixed texts in util/question_dataset
+#
+# build it once offline (and again whenever the datasets change):
+#   python embedding_index.py build --questions
+#
+# tables live in a folder per vector space (backend, model and quantization, see encoder.vector_backend),
+# so vectors of different models or backends are never mixed.
+# every table is stored as <name>.npy (float32 matrix, memory-mapped at load time)
+# plus <name>.json (text -> row number). the references table holds the embeddings of every
+# question's possible_answers in consecutive rows, its .json maps the normalized question text
+# to the [start, end) row range of its answers.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(BASE_DIR, "util", "question_dataset")
+INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", os.path.join(BASE_DIR, "util", "embedding_index", encoder.vector_backend()))
+CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")) # max texts kept in the fallback lru
+
+# questions are looked up case and whitespace insensitively
+def normalize_question(text):
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+# yield every question entry from the dataset files: [{"beginner": [...]}, {"intermediate": [...]}, ...]
+def iter_dataset_questions(dataset_dir=DATASET_DIR):
+    for path in sorted(glob.glob(os.path.join(dataset_dir, "*.json"))):
+        with open(path, "r") as file:
+            data = json.load(file)
+        for level_group in data:
+            for questions in level_group.values():
+                for question in questions:
+                    yield question
+
+# write a matrix and its text -> row mapping next to each other (atomic replace so readers never see half a file)
+def save_table(index_dir, name, texts, embeddings, rows=None):
+    os.makedirs(index_dir, exist_ok=True)
+    matrix_path = os.path.join(index_dir, f"{name}.npy")
+    rows_path = os.path.join(index_dir, f"{name}.json")
+
+    with open(matrix_path + ".tmp", "wb") as file:
+        np.save(file, np.asarray(embeddings, dtype=np.float32))
+    with open(rows_path + ".tmp", "w") as file:
+        json.dump(rows if rows is not None else {text: row for row, text in enumerate(texts)}, file)
+
+    os.replace(matrix_path + ".tmp", matrix_path)
+    os.replace(rows_path + ".tmp", rows_path)
+
+# possible_answers of every question, consecutive rows per question: (texts, normalized question -> [start, end))
+def reference_rows(questions):
+    answers = OrderedDict()
+    for question in questions:
+        for answer in question.get("possible_answers", []):
+            answers.setdefault(normalize_question(question["question"]), OrderedDict()).setdefault(answer, None)
+
+    texts = []
+    ranges = {}
+    for question, question_answers in answers.items():
+        ranges[question] = [len(texts), len(texts) + len(question_answers)]
+        texts.extend(question_answers)
+    return texts, ranges
+
+# embed every distinct keypoint, every question's reference answers (and optionally every question) in the datasets
+def build_index(encode, dataset_dir=DATASET_DIR, index_dir=INDEX_DIR, include_questions=False):
+    keypoints = {}
+    questions = {}
+    dataset_questions = list(iter_dataset_questions(dataset_dir))
+    for question in dataset_questions:
+        for key_point in question.get("keypoints", []):
+            keypoints.setdefault(key_point, None)
+        questions.setdefault(question["question"], None)
+
+    tables = {"keypoints": list(keypoints)}
+    if include_questions:
+        tables["questions"] = list(questions)
+
+    for name, texts in tables.items():
+        save_table(index_dir, name, texts, encode(texts))
+        print(f"[embedding_index] {name}: {len(texts)} rows written to {index_dir}")
+
+    reference_texts, reference_ranges = reference_rows(dataset_questions)
+    save_table(index_dir, "references", reference_texts, encode(reference_texts), rows=reference_ranges)
+    print(f"[embedding_index] references: {len(reference_texts)} rows for {len(reference_ranges)} questions written to {index_dir}")
+
+    counts = {name: len(texts) for name, texts in tables.items()}
+    counts["references"] = len(reference_texts)
+    return counts
+
+
+# read-only view over one precomputed table, with an lru for texts that are not in it
+class EmbeddingIndex:
+
+    def __init__(self, name, encode, index_dir=INDEX_DIR, cache_size=CACHE_SIZE):
+        self.name = name
+        self.encode = encode # function: list of texts -> 2d array of embeddings
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # text -> embedding for texts missing from the table
+        self.lock = threading.Lock() # the lru is shared by the server's request threads
+        self.matrix = None
+        self.rows = {}
+
+        matrix_path = os.path.join(index_dir, f"{name}.npy")
+        rows_path = os.path.join(index_dir, f"{name}.json")
+        if os.path.exists(matrix_path) and os.path.exists(rows_path):
+            self.matrix = np.load(matrix_path, mmap_mode="r")
+            with open(rows_path, "r") as file:
+                self.rows = json.load(file)
+        else:
+            print(f"[embedding_index] no precomputed '{name}' table in {index_dir}, encoding on the fly")
+
+    def __len__(self):
+        return len(self.rows)
+
+    # return a (len(texts), dim) float32 array, encoding only the texts we have never seen
+    def lookup(self, texts):
+        vectors = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for i, text in enumerate(texts):
+                row = self.rows.get(text)
+                if row is not None:
+                    vectors[i] = self.matrix[row]
+                elif text in self.cache:
+                    self.cache.move_to_end(text)
+                    vectors[i] = self.cache[text]
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        # encode all unseen texts in a single batch (outside the lock, other requests keep using the cache)
+        if missing:
+            new_texts = list(missing)
+            new_vectors = np.asarray(self.encode(new_texts), dtype=np.float32)
+            for text, vector in zip(new_texts, new_vectors):
+                for i in missing[text]:
+                    vectors[i] = vector
+                self.remember(text, vector)
+
+        if not vectors:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack(vectors)
+
+    # store a vector in the bounded lru
+    def remember(self, text, vector):
+        if self.cache_size <= 0:
+            return
+        with self.lock:
+            self.cache[text] = vector
+            self.cache.move_to_end(text)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    @property
+    def dim(self):
+        if self.matrix is not None:
+            return self.matrix.shape[1]
+        with self.lock:
+            if self.cache:
+                return next(iter(self.cache.values())).shape[0]
+        return 0
+
+
+# reference answer embeddings per question: a slice of the memory-mapped references table, questions
+# missing from it fall back to encoding the possible_answers sent with the request (kept in an lru)
+class ReferenceIndex:
+
+    def __init__(self, encode, index_dir=INDEX_DIR, cache_size=CACHE_SIZE):
+        self.encode = encode
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # normalized question -> reference matrix
+        self.lock = threading.Lock()
+        self.matrix = None
+        self.ranges = {}
+
+        matrix_path = os.path.join(index_dir, "references.npy")
+        ranges_path = os.path.join(index_dir, "references.json")
+        if os.path.exists(matrix_path) and os.path.exists(ranges_path):
+            self.matrix = np.load(matrix_path, mmap_mode="r")
+            with open(ranges_path, "r") as file:
+                self.ranges = json.load(file)
+        else:
+            print(f"[embedding_index] no precomputed 'references' table in {index_dir}, encoding on the fly")
+
+    def __len__(self):
+        return len(self.ranges)
+
+    # whether lookup() would find reference answers, without encoding any
+    def has_references(self, question, possible_answers=None):
+        if possible_answers:
+            return True
+        key = normalize_question(question)
+        if key in self.ranges:
+            return True
+        with self.lock:
+            return key in self.cache
+
+    # (n_references, dim) embeddings of a question's reference answers, None when it has none
+    def lookup(self, question, possible_answers=None):
+        key = normalize_question(question)
+        row_range = self.ranges.get(key)
+        if row_range is not None:
+            return self.matrix[row_range[0]:row_range[1]]
+
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        if not possible_answers:
+            return None
+
+        references = np.asarray(self.encode(list(possible_answers)), dtype=np.float32)
+        if self.cache_size > 0:
+            with self.lock:
+                self.cache[key] = references
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return references
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute dataset embeddings for keypoint and reference answer scoring")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--dataset-dir", default=DATASET_DIR)
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--backend", default=encoder.ENCODER_BACKEND, choices=sorted(encoder.BACKENDS))
+    parser.add_argument("--questions", action="store_true", help="also embed every question text")
+    args = parser.parse_args()
+
+    index_dir = args.index_dir
+    if encoder.vector_backend(args.backend) != encoder.vector_backend() and "EMBEDDING_INDEX_DIR" not in os.environ:
+        index_dir = os.path.join(os.path.dirname(INDEX_DIR), encoder.vector_backend(args.backend))
+
+    build_index(
+        lambda texts: encoder.encode(texts, backend=args.backend, batch_size=64),
+        dataset_dir=args.dataset_dir,
+        index_dir=index_dir,
+        include_questions=args.questions,
+    )
@@ -0,0 +1,233 @@
+import argparse
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+import numpy as np
+
+# one process hosting the sentence encoder for every server worker on the host
+#
+#   python embedding_service.py --backend onnx                 # start the service
+#   ENCODER_BACKEND=remote python server.py                    # workers encode through it
+#
+# workers send (request id, texts) over a local socket (a unix socket, or host:port where those are
+# not available). the service waits up to EMBEDDING_BATCH_WAIT_MS for more requests after the first
+# one, encodes them all as one batch and sends every caller its own rows back, so the model is
+# loaded once per host and concurrent requests share forward passes.
+#
+# messages are pickles, so only peers holding the shared secret may connect: EMBEDDING_SERVICE_AUTHKEY,
+# or else a random key the service writes to EMBEDDING_SERVICE_AUTHKEY_FILE (owner-only) on its first
+# start and the workers of the same user read from there. the unix socket is owner-only as well.
+
+DEFAULT_ADDRESS = "127.0.0.1:8600" if os.name == "nt" else "/tmp/ai-server-embeddings.sock"
+SERVICE_ADDRESS = os.getenv("EMBEDDING_SERVICE_ADDRESS", DEFAULT_ADDRESS)
+AUTHKEY_FILE = os.getenv("EMBEDDING_SERVICE_AUTHKEY_FILE", os.path.join(os.path.expanduser("~"), ".ai-server", "embedding-service.key"))
+MIN_AUTHKEY_LENGTH = 16
+MAX_BATCH = int(os.getenv("EMBEDDING_BATCH_SIZE", "64")) # texts per forward pass
+MAX_WAIT = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5")) / 1000 # time to collect more requests
+
+# the shared secret from the environment or the key file (generated there first when create is set)
+def load_authkey(path=AUTHKEY_FILE, create=False):
+    key = os.getenv("EMBEDDING_SERVICE_AUTHKEY")
+    if key:
+        if len(key) < MIN_AUTHKEY_LENGTH:
+            raise RuntimeError(f"EMBEDDING_SERVICE_AUTHKEY must be at least {MIN_AUTHKEY_LENGTH} characters")
+        return key.encode("utf-8")
+
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass # created by a service starting at the same time
+        else:
+            with os.fdopen(fd, "w") as file:
+                file.write(secrets.token_hex(32))
+            print(f"[embedding_service] generated a new authkey in {path}")
+
+    if not os.path.exists(path):
+        raise RuntimeError(f"no embedding service authkey: set EMBEDDING_SERVICE_AUTHKEY or start embedding_service.py to create {path}")
+    if os.name != "nt":
+        info = os.stat(path)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise RuntimeError(f"{path} must be owned by this user and not accessible by others (chmod 600)")
+    with open(path, "r") as file:
+        key = file.read().strip()
+    if len(key) < MIN_AUTHKEY_LENGTH:
+        raise RuntimeError(f"{path} does not hold an authkey of at least {MIN_AUTHKEY_LENGTH} characters")
+    return key.encode("utf-8")
+
+# "host:port" -> (host, port) for a tcp socket, anything else is a unix socket path
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return (host, int(port))
+    return address
+
+
+class EmbeddingService:
+
+    def __init__(self, encode, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.encode = encode # function: list of texts -> 2d array of embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue() # (connection, send lock, request id, texts)
+        self.stats = {"requests": 0, "texts": 0, "batches": 0}
+
+    def serve(self, address=SERVICE_ADDRESS, authkey=None):
+        authkey = authkey or load_authkey(create=True)
+        address = parse_address(address)
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address) # stale socket of a previous run
+            # the socket file is created by bind, keep it readable and writable by this user only
+            umask = os.umask(0o177)
+            try:
+                listener = Listener(address, authkey=authkey)
+            finally:
+                os.umask(umask)
+        else:
+            listener = Listener(address, authkey=authkey)
+
+        threading.Thread(target=self.run_batches, name="embedding-batches", daemon=True).start()
+        with listener:
+            print(f"[embedding_service] listening on {listener.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    print(f"[embedding_service] rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    # read requests of one worker connection until it closes
+    def handle(self, connection):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                request_id, texts = connection.recv()
+                if texts == "stats":
+                    with send_lock:
+                        connection.send((request_id, dict(self.stats)))
+                    continue
+                self.requests.put((connection, send_lock, request_id, list(texts)))
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    # the first waiting request plus whatever else arrives within max_wait, up to max_batch texts
+    def next_batch(self):
+        batch = [self.requests.get()]
+        count = len(batch[0][3])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request[3])
+        return batch
+
+    def run_batches(self):
+        while True:
+            batch = self.next_batch()
+            texts = [text for request in batch for text in request[3]]
+            try:
+                vectors = np.asarray(self.encode(texts), dtype=np.float32) if texts else None
+                error = None
+            except Exception as e:
+                print(f"[embedding_service] encode failed: {e}")
+                error = str(e)
+
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += 1
+
+            offset = 0
+            for connection, send_lock, request_id, request_texts in batch:
+                if error is not None:
+                    reply = ("error", error)
+                elif request_texts:
+                    reply = vectors[offset:offset + len(request_texts)]
+                else:
+                    reply = np.zeros((0, 0), dtype=np.float32)
+                offset += len(request_texts)
+                try:
+                    with send_lock:
+                        connection.send((request_id, reply))
+                except OSError:
+                    pass # the worker went away
+
+
+# worker side: looks like a SentenceTransformer to encoder.py (one connection per thread)
+class EmbeddingClient:
+
+    def __init__(self, address=SERVICE_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey # read on the first connection (see load_authkey)
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            if self.authkey is None:
+                self.authkey = load_authkey()
+            connection = self.local.connection = Client(parse_address(self.address), authkey=self.authkey)
+            self.local.next_id = 0
+        return connection
+
+    # send one request and wait for its reply, reconnecting once if the service restarted
+    def request(self, payload):
+        for attempt in range(2):
+            try:
+                connection = self.connection()
+                self.local.next_id += 1
+                connection.send((self.local.next_id, payload))
+                request_id, reply = connection.recv()
+                break
+            except (EOFError, OSError) as e:
+                connection = getattr(self.local, "connection", None)
+                if connection is not None:
+                    connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise RuntimeError(f"embedding service at {self.address} is not reachable: {e}") from e
+
+        if isinstance(reply, tuple) and reply[:1] == ("error",):
+            raise RuntimeError(f"embedding service failed: {reply[1]}")
+        return reply
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=None):
+        if isinstance(texts, str):
+            return self.request([texts])[0]
+        return self.request(list(texts))
+
+    def stats(self):
+        return self.request("stats")
+
+
+if __name__ == "__main__":
+    import encoder
+
+    parser = argparse.ArgumentParser(description="Shared sentence encoder for every server worker on this host")
+    parser.add_argument("--backend", default=encoder.EMBEDDING_SERVICE_BACKEND, choices=sorted(set(encoder.BACKENDS) - {"remote"}))
+    parser.add_argument("--address", default=SERVICE_ADDRESS, help="unix socket path or host:port")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="texts per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000, help="time to collect more requests into a batch")
+    parser.add_argument("--authkey-file", default=AUTHKEY_FILE, help="key file generated on first start when EMBEDDING_SERVICE_AUTHKEY is not set")
+    args = parser.parse_args()
+
+    encoder.warm_up(args.backend)
+    service = EmbeddingService(
+        lambda texts: encoder.encode(texts, backend=args.backend, batch_size=args.max_batch),
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    service.serve(args.address, load_authkey(args.authkey_file, create=True))
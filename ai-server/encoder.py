@@ -0,0 +1,119 @@
+import os
+import re
+import threading
+import numpy as np
+
+# sentence encoder used for keypoint detection, loaded lazily on first use
+#
+# ENCODER_BACKEND selects how the model runs:
+#   torch (default) - full precision SentenceTransformer on the cpu
+#   onnx            - onnx runtime graph with dynamic int8 quantization, exported with
+#                     `python encoder.py export` (exported on first load if it is missing)
+#   remote          - the shared model of embedding_service.py (running EMBEDDING_SERVICE_BACKEND),
+#                     so every worker on the host uses one model and concurrent requests are batched
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_NAME = os.getenv("ENCODER_MODEL", "all-mpnet-base-v2")
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+
+# model name usable as a directory name ("sentence-transformers/all-mpnet-base-v2" -> "sentence-transformers_all-mpnet-base-v2")
+def model_slug(model_name=MODEL_NAME):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+
+ONNX_DIR = os.getenv("ENCODER_ONNX_DIR", os.path.join(BASE_DIR, "util", "onnx_model", model_slug())) # one export per model
+ONNX_QUANTIZATION = os.getenv("ENCODER_ONNX_QUANTIZATION", "avx2") # arm64, avx2, avx512 or avx512_vnni
+EMBEDDING_SERVICE_BACKEND = os.getenv("EMBEDDING_SERVICE_BACKEND", "torch") # backend the shared service runs
+
+_models = {}
+_lock = threading.Lock()
+
+# file name sentence-transformers gives the quantized graph
+def onnx_file_name(quantization=ONNX_QUANTIZATION):
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+# export the model to onnx and write a dynamically int8 quantized copy next to it
+def export_onnx(model_dir=ONNX_DIR, quantization=ONNX_QUANTIZATION):
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(MODEL_NAME, backend="onnx", device="cpu")
+    model.save_pretrained(model_dir)
+    export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+    print(f"[encoder] quantized onnx model written to {os.path.join(model_dir, onnx_file_name(quantization))}")
+
+def load_torch_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME, device="cpu")
+
+def load_onnx_model():
+    from sentence_transformers import SentenceTransformer
+
+    if not os.path.exists(os.path.join(ONNX_DIR, onnx_file_name())):
+        export_onnx()
+    return SentenceTransformer(
+        ONNX_DIR,
+        backend="onnx",
+        device="cpu",
+        model_kwargs={"file_name": onnx_file_name(), "provider": "CPUExecutionProvider"},
+    )
+
+def load_remote_model():
+    from embedding_service import EmbeddingClient
+    return EmbeddingClient()
+
+BACKENDS = {
+    "torch": load_torch_model,
+    "onnx": load_onnx_model,
+    "remote": load_remote_model,
+}
+
+# name of the vector space a backend produces: the backend that actually runs the model (the remote
+# service runs one of the local backends, with the same ENCODER_MODEL), the model and, for onnx, the
+# quantization. precomputed tables are only valid for vectors of the same space
+def vector_backend(backend=None):
+    backend = backend or ENCODER_BACKEND
+    if backend == "remote":
+        backend = EMBEDDING_SERVICE_BACKEND
+    if backend == "onnx":
+        return f"onnx-{model_slug()}-qint8_{ONNX_QUANTIZATION}"
+    return f"{backend}-{model_slug()}"
+
+# load (once) and return the model for a backend
+def get_model(backend=None):
+    backend = backend or ENCODER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown encoder backend '{backend}', expected one of {sorted(BACKENDS)}")
+
+    model = _models.get(backend)
+    if model is None:
+        with _lock:
+            model = _models.get(backend)
+            if model is None:
+                print(f"[encoder] loading {MODEL_NAME} with the {backend} backend")
+                model = BACKENDS[backend]()
+                _models[backend] = model
+    return model
+
+# encode a text (1d array) or a list of texts (2d array) as float32 numpy
+def encode(texts, backend=None, batch_size=32):
+    embeddings = get_model(backend).encode(texts, convert_to_numpy=True, batch_size=batch_size)
+    return np.asarray(embeddings, dtype=np.float32)
+
+# load the model and run one encode so the first real request does not pay for it
+def warm_up(backend=None):
+    try:
+        encode(["warm up"], backend=backend)
+        print("[encoder] warm up done")
+    except Exception as e:
+        print(f"[encoder] warm up failed: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sentence encoder utilities")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model-dir", default=ONNX_DIR)
+    parser.add_argument("--quantization", default=ONNX_QUANTIZATION)
+    args = parser.parse_args()
+
+    export_onnx(args.model_dir, args.quantization)
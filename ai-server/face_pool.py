@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import mediapipe as mp
+
+# face mesh inference off the event loop
+#
+# every worker thread owns its own FaceMesh graph (mediapipe releases the GIL while the graph runs,
+# so threads scale with cores and frames are handed over without copying or pickling).
+# frames of every session land on whichever worker is free, so the graphs run in static image mode:
+# tracking mode would carry one candidate's face region into another session's frame (and with the
+# per-session face crops of frame_preprocessing.py the tracked region would jump between crops).
+# pinning sessions to workers would not help once there are more sessions than workers, and the
+# face crop already keeps the per-frame face detection cheap.
+# every websocket session has a LatestFrameSlot: while a frame is being analyzed, newer frames
+# replace the pending one instead of queueing up behind it.
+
+FACE_MESH_WORKERS = int(os.getenv("FACE_MESH_WORKERS", str(os.cpu_count() or 1)))
+
+mp_face_mesh = mp.solutions.face_mesh
+_local = threading.local()
+
+# initialize mediapipe face detection: this will detect face landmarks (468 points on the face)
+def create_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=True, # detect on every frame, frames of different sessions share a graph
+        max_num_faces=1, # only track one face
+        refine_landmarks=True, # get more precise landmarks for iris and lips
+        min_detection_confidence=0.5, # minimum confidence to detect face
+        min_tracking_confidence=0.5, # minimum confidence to track face (unused in static image mode)
+    )
+
+# face mesh instance of the current worker thread
+def get_face_mesh():
+    face_mesh = getattr(_local, "face_mesh", None)
+    if face_mesh is None:
+        face_mesh = create_face_mesh()
+        _local.face_mesh = face_mesh
+    return face_mesh
+
+
+# pool of worker threads, each with its own face mesh
+class FaceMeshPool:
+
+    def __init__(self, workers=FACE_MESH_WORKERS):
+        self.workers = workers
+        self.executor = None # threads are started on first use (and again after a shutdown)
+
+    # run fn(*args) on a worker thread without blocking the event loop
+    async def run(self, fn, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="face-mesh")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+# single pending frame per session: the newest frame always wins
+class LatestFrameSlot:
+
+    def __init__(self):
+        self.frame = None
+        self.closed = False
+        self.dropped = 0 # frames replaced before they were analyzed
+        self.event = asyncio.Event()
+
+    # store a frame, replacing (dropping) the one still waiting
+    def put(self, frame):
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self.event.set()
+
+    # wait for the next frame, returns None once the slot is closed and empty
+    async def get(self):
+        while self.frame is None:
+            if self.closed:
+                return None
+            self.event.clear()
+            await self.event.wait()
+        frame = self.frame
+        self.frame = None
+        return frame
+
+    def close(self):
+        self.closed = True
+        self.event.set()
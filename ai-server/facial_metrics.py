@@ -0,0 +1,268 @@
+import os
+from functools import lru_cache
+import cv2
+import numpy as np
+
+# facial metrics computed from mediapipe face mesh landmarks
+#
+# the landmarks of a frame are converted once into a (478, 3) float32 array (normalized x, y, z)
+# and every metric reads it with fancy indexing. the *_batch functions take a (n, 478, 3) stack
+# so recorded sessions can be scored thousands of frames at a time.
+
+NUM_LANDMARKS = 478 # 468 face points + 10 iris points (refine_landmarks=True)
+HEAD_MOTION_EPSILON = float(os.getenv("HEAD_MOTION_EPSILON", "2")) # pixels the head landmarks must move before the pose is solved again
+
+# mediapipe landmarks indices for specific facial features
+LEFT_EYE_CORNERS = (362, 263) # outer and inner corners of left eye
+RIGHT_EYE_CORNERS = (33, 133) # outer and inner  corners of right eye
+LEFT_IRIS = 473 # center of left iris
+RIGHT_IRIS = 468 # center of right iris
+LEFT_UPPER = 159 # top of left eyelid
+LEFT_LOWER = 145 # bottom of left eyelid
+RIGHT_UPPER = 386 # top of right eyelid
+RIGHT_LOWER = 374 # bottom of right eyelid
+
+HEAD_LANDMARKS = [33, 263, 1, 61, 291, 199] # landmarks for headpose estimation
+
+UPPER_LIP_IDS = [185,40,39,37,0,267,269,270,409,415,310,311,312,13,82,81,42,183,78] # landmarks for upper lip regions
+LOWER_LIP_IDS = [61,146,91,181,84,17,314,405,321,375,291,308,324,318,402,317,14,87,178,88,95] # landmarks for lower lip regions
+MOUTH_CORNERS = (61, 291) # left and right mouth corners
+
+# every landmark the eye ratios need, in the order compute_eye_ratios unpacks them
+EYE_IDS = np.array([
+    LEFT_EYE_CORNERS[0], LEFT_EYE_CORNERS[1],
+    RIGHT_EYE_CORNERS[0], RIGHT_EYE_CORNERS[1],
+    LEFT_IRIS, RIGHT_IRIS,
+    LEFT_UPPER, LEFT_LOWER,
+])
+HEAD_IDS = np.array(HEAD_LANDMARKS)
+UPPER_LIP = np.array(UPPER_LIP_IDS)
+LOWER_LIP = np.array(LOWER_LIP_IDS)
+MOUTH_CORNER_IDS = np.array(MOUTH_CORNERS)
+
+
+# convert mediapipe face landmarks into a (478, 3) float32 array, once per frame
+def landmarks_to_array(face_landmarks):
+    return np.array([(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark], dtype=np.float32)
+
+# accept either a landmark array or a mediapipe landmark list
+def as_landmark_array(face_landmarks):
+    if isinstance(face_landmarks, np.ndarray):
+        return face_landmarks
+    return landmarks_to_array(face_landmarks)
+
+# pixel coordinates (float64) of the given landmarks, shape (..., len(ids), 2)
+def pixel_points(landmarks, ids, w, h):
+    return landmarks[..., ids, :2].astype(np.float64) * np.array([w, h], dtype=np.float64)
+
+
+# function to calculate where the iris is positioned within each eye: return horizontal_ratio (0=far left, 1=far right) and vertical_ratio (0=top, 1=b0ttom)
+def compute_eye_ratios(face_landmarks, w, h):
+    landmarks = as_landmark_array(face_landmarks)
+
+    # get pixel coordinates of eye corners, iris centers and eyelids
+    lx_outer, lx_inner, rx_outer, rx_inner, left_iris, right_iris, left_upper, left_lower = pixel_points(landmarks, EYE_IDS, w, h)
+
+    # calculate eye widths (distance between corners)
+    left_eye_width = np.linalg.norm(lx_inner - lx_outer) + 1e-6 # +1e-6 prevents division by zero
+    right_eye_width = np.linalg.norm(rx_inner - rx_outer) + 1e-6
+
+    # calculate how far across the eye the iris is (0.0 = outer corner, 1.0 = inner corner)
+    left_ratio = np.linalg.norm(left_iris - lx_outer) / left_eye_width
+    right_ratio = np.linalg.norm(right_iris - rx_outer) / right_eye_width
+    horizontal_ratio = float((left_ratio + right_ratio) / 2.0)
+
+    # calculate vertical position within left eye (using eyelid landmarks)
+    vertical_ratio = float((left_iris[1] - left_upper[1]) / (left_lower[1] - left_upper[1] + 1e-6))
+
+    return horizontal_ratio, vertical_ratio
+
+# eye ratios for a (n, 478, 3) stack of landmarks: returns two (n,) arrays
+def compute_eye_ratios_batch(landmarks, w, h):
+    points = pixel_points(landmarks, EYE_IDS, w, h) # (n, 8, 2)
+    lx_outer, lx_inner, rx_outer, rx_inner, left_iris, right_iris, left_upper, left_lower = np.moveaxis(points, 1, 0)
+
+    left_eye_width = np.linalg.norm(lx_inner - lx_outer, axis=-1) + 1e-6
+    right_eye_width = np.linalg.norm(rx_inner - rx_outer, axis=-1) + 1e-6
+
+    left_ratio = np.linalg.norm(left_iris - lx_outer, axis=-1) / left_eye_width
+    right_ratio = np.linalg.norm(right_iris - rx_outer, axis=-1) / right_eye_width
+    horizontal_ratio = (left_ratio + right_ratio) / 2.0
+
+    vertical_ratio = (left_iris[:, 1] - left_upper[:, 1]) / (left_lower[:, 1] - left_upper[:, 1] + 1e-6)
+
+    return horizontal_ratio, vertical_ratio
+
+
+# 2d (truncated pixel) and 3d points of the head pose landmarks
+def head_pose_points(landmarks, img_w, img_h):
+    face_2d = np.trunc(pixel_points(landmarks, HEAD_IDS, img_w, img_h)) # same as int(lm.x * img_w)
+    face_3d = np.empty((len(HEAD_IDS), 3), dtype=np.float64)
+    face_3d[:, :2] = face_2d
+    face_3d[:, 2] = landmarks[HEAD_IDS, 2]
+    return face_2d, face_3d
+
+# create camera matrix
+def camera_matrix(img_w, img_h):
+    focal_length = img_w
+    return np.array([[focal_length, 0, img_h / 2],
+                     [0, focal_length, img_w / 2],
+                     [0, 0, 1]])
+
+# camera matrix per frame size, built once (read-only, shared by every session)
+@lru_cache(maxsize=32)
+def cached_camera_matrix(img_w, img_h):
+    matrix = camera_matrix(img_w, img_h)
+    matrix.flags.writeable = False
+    return matrix
+
+DIST_MATRIX = np.zeros((4, 1), dtype=np.float64) # assume no lens distortion
+
+# convert rotation vector to rotation matrix, then to euler angles: returns pitch (x) and yaw (y) in degrees
+def rotation_to_angles(rot_vec):
+    rmat, _ = cv2.Rodrigues(rot_vec)
+    angles, _, _, _, _, _ = cv2.RQDecomp3x3(rmat)
+    return angles[0] * 360, angles[1] * 360
+
+# classify head direction based on angle thresholds
+def classify_head_direction(x_ang, y_ang):
+    if y_ang < -10:
+        return "Looking Left"
+    elif y_ang > 10:
+        return "Looking Right"
+    elif x_ang < -10:
+        return "Looking Down"
+    elif x_ang > 10:
+        return "Looking Up"
+    else:
+        return "Center"
+
+# function to calculate head position using 3d geometry
+def compute_head_direction(face_landmarks, img_w, img_h):
+    landmarks = as_landmark_array(face_landmarks)
+
+    # extract 3d and 2d coordinates for key face landmarks
+    face_2d, face_3d = head_pose_points(landmarks, img_w, img_h)
+
+    # solve for head pose using perspective-n-point algorithm
+    success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cached_camera_matrix(img_w, img_h), DIST_MATRIX, flags=cv2.SOLVEPNP_ITERATIVE)
+
+    # extract pitch (up/down) and yaw (left/right) angles
+    x_ang, y_ang = rotation_to_angles(rot_vec)
+    return classify_head_direction(x_ang, y_ang)
+
+# per session head pose: solvePnP is warm started from the previous rotation/translation, and skipped
+# (the last direction is reused) while no head landmark moved by HEAD_MOTION_EPSILON pixels or more
+# since the last solve (depth included, mediapipe z has the same scale as x). a seated interviewee is mostly still, so most frames need no solve at all.
+class PoseTracker:
+    __slots__ = ("epsilon", "size", "points", "rot_vec", "trans_vec", "direction", "solves", "skips")
+
+    def __init__(self, epsilon=HEAD_MOTION_EPSILON):
+        self.epsilon = epsilon
+        self.size = None # frame size of the last solve, a new size starts from scratch
+        self.points = None # head landmarks of the last solve in pixels (x, y, z * width)
+        self.rot_vec = None
+        self.trans_vec = None
+        self.direction = None
+        self.solves = 0
+        self.skips = 0
+
+    def reset(self):
+        self.size = self.points = self.rot_vec = self.trans_vec = self.direction = None
+
+    # head direction of a frame, same classification as compute_head_direction
+    def update(self, face_landmarks, img_w, img_h):
+        landmarks = as_landmark_array(face_landmarks)
+        face_2d, face_3d = head_pose_points(landmarks, img_w, img_h)
+        points = np.column_stack((face_2d, face_3d[:, 2] * img_w))
+        size = (img_w, img_h)
+        if size != self.size:
+            self.reset()
+
+        # the head has not moved: keep the last direction
+        if self.direction is not None and np.abs(points - self.points).max() < self.epsilon:
+            self.skips += 1
+            return self.direction
+
+        cam_matrix = cached_camera_matrix(img_w, img_h)
+        if self.rot_vec is not None:
+            success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, DIST_MATRIX, rvec=self.rot_vec.copy(),
+                                                       tvec=self.trans_vec.copy(), useExtrinsicGuess=True, flags=cv2.SOLVEPNP_ITERATIVE)
+        else:
+            success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, DIST_MATRIX, flags=cv2.SOLVEPNP_ITERATIVE)
+        self.solves += 1
+
+        direction = classify_head_direction(*rotation_to_angles(rot_vec))
+        if success:
+            self.size, self.points, self.rot_vec, self.trans_vec, self.direction = size, points, rot_vec, trans_vec, direction
+        else:
+            self.reset() # do not warm start from a failed solve
+        return direction
+
+
+# head direction for a (n, 478, 3) stack of landmarks (solvePnP has no batch form, so this loops)
+def compute_head_direction_batch(landmarks, img_w, img_h):
+    cam_matrix = cached_camera_matrix(img_w, img_h)
+    directions = []
+    for frame_landmarks in landmarks:
+        face_2d, face_3d = head_pose_points(frame_landmarks, img_w, img_h)
+        success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, DIST_MATRIX, flags=cv2.SOLVEPNP_ITERATIVE)
+        directions.append(classify_head_direction(*rotation_to_angles(rot_vec)))
+    return directions
+
+
+# function to determine eye gaze direction by comparing current position to calibrated center
+# uses thresholds to determine if eyes have moved significantly from center
+def classify_eye_direction(sm_h, sm_v, center_h, center_v):
+    h_thresh = 0.08 # horizontal threshold for left/right detection
+    v_thresh = 0.06 # vertical threshold for up/down detection
+
+    # calculate difference from calibrated center position
+    dh = sm_h - center_h
+    dv = sm_v - center_v
+
+    # classify based on which threshold is exceeded
+    if dh < -h_thresh:
+        return "Looking Left"
+    elif dh > h_thresh:
+        return "Looking Right"
+    elif dv > v_thresh:
+        return "Looking Down"
+    else:
+        return "Looking Up"
+
+
+# function to calculate mouth opening percentage: returns opening_percent & mouth_state
+def compute_mouth_opening(face_landmarks, w, h, threshold=2):
+    landmarks = as_landmark_array(face_landmarks)
+
+    # calculate average position of upper and lower lip regions: (x,y) coordinates
+    upper_mean = np.mean(pixel_points(landmarks, UPPER_LIP, w, h), axis=0)
+    lower_mean = np.mean(pixel_points(landmarks, LOWER_LIP, w, h), axis=0)
+
+    # vertical distance between upper and lower lips (mouth opening)
+    mouth_open = max(0.0, lower_mean[1] - upper_mean[1]) # prevent from negative
+
+    # get mouth width using corner landmarks
+    left_corner, right_corner = pixel_points(landmarks, MOUTH_CORNER_IDS, w, h)
+    mouth_width = np.linalg.norm(right_corner - left_corner) + 1e-6
+
+    # calculate opening as percentage of mouth width
+    opening_ratio = (mouth_open / mouth_width) * 100.0
+    opening_ratio = round(float(opening_ratio), 2)
+
+    # determine if person is speaking based on threshold
+    mouth_state = "Speaking" if opening_ratio > threshold else "Silent"
+    return opening_ratio, mouth_state
+
+# mouth opening for a (n, 478, 3) stack of landmarks: returns (n,) opening percentages and speaking flags
+def compute_mouth_opening_batch(landmarks, w, h, threshold=2):
+    upper_mean = np.mean(pixel_points(landmarks, UPPER_LIP, w, h), axis=1)
+    lower_mean = np.mean(pixel_points(landmarks, LOWER_LIP, w, h), axis=1)
+    mouth_open = np.maximum(0.0, lower_mean[:, 1] - upper_mean[:, 1])
+
+    corners = pixel_points(landmarks, MOUTH_CORNER_IDS, w, h)
+    mouth_width = np.linalg.norm(corners[:, 1] - corners[:, 0], axis=-1) + 1e-6
+
+    opening_ratio = np.round((mouth_open / mouth_width) * 100.0, 2)
+    return opening_ratio, opening_ratio > threshold
@@ -0,0 +1,94 @@
+import os
+import cv2
+import numpy as np
+from facial_metrics import landmarks_to_array
+
+# adaptive preprocessing of websocket frames before face mesh
+#
+# frames are downscaled so their longest side is at most WS_WORKING_SIZE pixels. once a face has
+# been found, the next frame is cropped to that face's bounding box plus a margin, so far fewer
+# pixels go through mediapipe. landmarks found in the crop are mapped back to normalized
+# coordinates of the original frame, so all metrics keep working on the full image size.
+# when the face is lost inside the crop, the frame is retried on the full image.
+
+WORKING_SIZE = int(os.getenv("WS_WORKING_SIZE", "480")) # longest side given to face mesh (0 = no downscaling)
+ROI_MARGIN = float(os.getenv("WS_ROI_MARGIN", "0.3")) # margin around the previous face box, as a share of its size
+ROI_ENABLED = os.getenv("WS_ROI_CROP", "1") != "0"
+
+
+class FramePreprocessor:
+
+    def __init__(self, working_size=WORKING_SIZE, margin=ROI_MARGIN, crop=ROI_ENABLED):
+        self.working_size = working_size
+        self.margin = margin
+        self.crop = crop
+        self.roi = None # (x0, y0, x1, y1) pixel box in the original frame, None = full frame
+
+    # cut the region of interest out of the frame and downscale it to the working size
+    # returns the image for face mesh and the crop box (x0, y0, width, height) in original pixels
+    def prepare(self, rgb, roi=None):
+        img_h, img_w = rgb.shape[:2]
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, img_w, img_h)
+        view = rgb[y0:y1, x0:x1]
+        crop_h, crop_w = view.shape[:2]
+
+        scale = 1.0
+        if self.working_size > 0:
+            scale = min(1.0, self.working_size / max(crop_w, crop_h))
+        if scale < 1.0:
+            size = (max(1, round(crop_w * scale)), max(1, round(crop_h * scale)))
+            view = cv2.resize(view, size, interpolation=cv2.INTER_AREA)
+        else:
+            view = np.ascontiguousarray(view)
+
+        return view, (x0, y0, crop_w, crop_h)
+
+    # map landmarks normalized to the crop back to normalized coordinates of the original frame
+    # (downscaling does not change normalized coordinates, only the crop offset and size matter)
+    @staticmethod
+    def to_frame_coordinates(landmarks, box, img_w, img_h):
+        x0, y0, crop_w, crop_h = box
+        if box == (0, 0, img_w, img_h):
+            return landmarks
+        landmarks[:, 0] = (landmarks[:, 0] * crop_w + x0) / img_w
+        landmarks[:, 1] = (landmarks[:, 1] * crop_h + y0) / img_h
+        landmarks[:, 2] *= crop_w / img_w # mediapipe z uses the same scale as x
+        return landmarks
+
+    # square box around the face landmarks plus the margin, clamped to the frame
+    def face_box(self, landmarks, img_w, img_h):
+        xs = landmarks[:, 0] * img_w
+        ys = landmarks[:, 1] * img_h
+        center_x = (xs.min() + xs.max()) / 2
+        center_y = (ys.min() + ys.max()) / 2
+        half = max(xs.max() - xs.min(), ys.max() - ys.min()) * (0.5 + self.margin)
+
+        x0 = max(0, int(center_x - half))
+        y0 = max(0, int(center_y - half))
+        x1 = min(img_w, int(np.ceil(center_x + half)))
+        y1 = min(img_h, int(np.ceil(center_y + half)))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    # run face mesh on the prepared frame, returns a (478, 3) landmark array in original frame coordinates or None
+    def detect(self, face_mesh, rgb):
+        img_h, img_w = rgb.shape[:2]
+        landmarks = self.run(face_mesh, rgb, self.roi, img_w, img_h)
+
+        # tracking lost inside the crop: fall back to the full frame
+        if landmarks is None and self.roi is not None:
+            self.roi = None
+            landmarks = self.run(face_mesh, rgb, None, img_w, img_h)
+
+        if self.crop:
+            self.roi = self.face_box(landmarks, img_w, img_h) if landmarks is not None else None
+        return landmarks
+
+    def run(self, face_mesh, rgb, roi, img_w, img_h):
+        image, box = self.prepare(rgb, roi)
+        results = face_mesh.process(image)
+        if not results.multi_face_landmarks:
+            return None
+        landmarks = landmarks_to_array(results.multi_face_landmarks[0])
+        return self.to_frame_coordinates(landmarks, box, img_w, img_h)
@@ -0,0 +1,306 @@
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+import encoder
+import keypoint_detection as key_det
+
+# keypoint detection that runs while the candidate is still answering
+#
+# transcript chunks are appended to a scoring session as they are transcribed. every completed
+# sentence (or run of WINDOW_WORDS words without punctuation) is embedded once, together with the
+# previous one as a sliding window, and the session keeps the running max similarity of every
+# keypoint and reference answer over those windows. finalizing only embeds the unfinished tail,
+# so the result is ready almost as soon as the answer ends, and long answers are never truncated
+# at the model's token limit because no window is longer than two units.
+#
+# with several server workers the chunks of one answer land on different processes, so sessions are
+# kept in a SessionStore: MongoSessionStore shares them through mongo (server.py uses it unless
+# SCORING_SESSION_STORE=memory), MemorySessionStore only works with a single worker process.
+
+WINDOW_WORDS = int(os.getenv("SCORING_WINDOW_WORDS", "40")) # max words of one unit without sentence punctuation
+SESSION_TTL = float(os.getenv("SCORING_SESSION_TTL", "900")) # seconds an untouched session is kept
+MAX_SESSIONS = int(os.getenv("MAX_SCORING_SESSIONS", "10000")) # memory store only, mongo expires them by ttl
+UPDATE_RETRIES = 5 # concurrent updates of one mongo session before giving up
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\S+")
+
+
+# a chunk was sent after the session was finalized
+class SessionFinalizedError(Exception):
+    pass
+
+# a mongo session kept changing under this update (UPDATE_RETRIES times)
+class SessionConflictError(Exception):
+    pass
+
+
+class ScoringSession:
+
+    def __init__(self, data):
+        self.data = {key: data.get(key) for key in ("question_id", "question_level", "question", "keypoints")}
+        self.data["keypoints"] = list(self.data["keypoints"] or [])
+        self.possible_answers = list(data.get("possible_answers") or [])
+        self.transcript = ""
+        self.consumed = 0 # transcript characters already split into embedded units
+        self.last_unit = "" # previous unit, the start of the next window
+        self.windows = 0
+        self.finalized = False
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.key_point_embeddings = key_det.keypoint_index.lookup(self.data["keypoints"])
+        self.reference_embeddings = key_det.reference_index.lookup(self.data["question"], self.possible_answers)
+        self.key_point_max = np.full(len(self.data["keypoints"]), -1.0)
+        self.reference_max = None if self.reference_embeddings is None else np.full(len(self.reference_embeddings), -1.0)
+
+    # plain (json/bson friendly) state of the session, the embeddings are looked up again on load
+    def state(self):
+        return {
+            "data": self.data,
+            "possible_answers": self.possible_answers,
+            "transcript": self.transcript,
+            "consumed": self.consumed,
+            "last_unit": self.last_unit,
+            "windows": self.windows,
+            "finalized": self.finalized,
+            "key_point_max": self.key_point_max.tolist(),
+            "reference_max": None if self.reference_max is None else self.reference_max.tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        session = cls({**state["data"], "possible_answers": state["possible_answers"]})
+        session.transcript = state["transcript"]
+        session.consumed = state["consumed"]
+        session.last_unit = state["last_unit"]
+        session.windows = state["windows"]
+        session.finalized = state["finalized"]
+        session.key_point_max = np.asarray(state["key_point_max"], dtype=np.float64)
+        if state["reference_max"] is not None and session.reference_max is not None:
+            session.reference_max = np.asarray(state["reference_max"], dtype=np.float64)
+        return session
+
+    # split the not yet embedded part of the transcript into completed units and the unfinished tail,
+    # returns (units, tail, transcript offset where the tail starts)
+    def pending_units(self):
+        pending = self.transcript[self.consumed:]
+        units = []
+        start = 0
+        for match in SENTENCE_END.finditer(pending):
+            units.extend(self.word_runs(pending[start:match.start()]))
+            start = match.end()
+        # a long tail without punctuation is cut into word runs, keeping the last (still growing) one pending
+        runs = self.word_runs(pending[start:])
+        units.extend(runs[:-1])
+        tail = runs[-1] if runs else ""
+        return units, tail, len(self.transcript) - len(tail)
+
+    # cut a text into runs of at most WINDOW_WORDS words (keeping the original spacing)
+    @staticmethod
+    def word_runs(text):
+        words = list(WORD.finditer(text))
+        runs = []
+        start = 0
+        for n in range(WINDOW_WORDS, len(words), WINDOW_WORDS):
+            end = words[n].start()
+            runs.append(text[start:end])
+            start = end
+        runs.append(text[start:])
+        return [run for run in runs if run]
+
+    # embed the windows ending at the new units and update the running maxima
+    def embed_units(self, units):
+        units = [unit.strip() for unit in units if unit.strip()]
+        if not units:
+            return
+        windows = []
+        for unit in units:
+            windows.append((self.last_unit + " " + unit).strip())
+            self.last_unit = unit
+
+        with key_det.stage_seconds.time("encode_windows"):
+            embeddings = encoder.encode(windows)
+        for embedding in embeddings:
+            if len(self.key_point_max):
+                self.key_point_max = np.maximum(self.key_point_max, key_det.cosine_similarities(embedding, self.key_point_embeddings))
+            if self.reference_max is not None:
+                self.reference_max = np.maximum(self.reference_max, key_det.cosine_similarities(embedding, self.reference_embeddings))
+        self.windows += len(windows)
+
+    # append a transcript chunk, embedding only the units it completed
+    # (separate=False when the chunk may continue the last word)
+    def add_chunk(self, text, separate=True):
+        with self.lock:
+            self.touched = time.monotonic()
+            if self.finalized:
+                raise SessionFinalizedError("scoring session is already finalized")
+            if not text:
+                return self.result()
+            # chunks from speech recognition rarely carry the space between them
+            if separate and self.transcript and not self.transcript[-1].isspace() and not text[0].isspace():
+                text = " " + text
+            self.transcript += text
+            units, _, self.consumed = self.pending_units()
+            self.embed_units(units)
+            return self.result()
+
+    # accept chunks again after finalize (the answer turned out to go on)
+    def reopen(self):
+        with self.lock:
+            self.finalized = False
+
+    # embed the unfinished tail and return the final detection result
+    def finalize(self):
+        with self.lock:
+            self.touched = time.monotonic()
+            if not self.finalized:
+                units, tail, _ = self.pending_units()
+                self.embed_units(units + [tail])
+                self.consumed = len(self.transcript)
+                self.finalized = True
+            return self.result()
+
+    # detection result for the transcript so far (same shape as keypoint_detection.detect_keypoints)
+    def result(self):
+        user_answer = self.transcript.lower()
+        user_ngrams = key_det.tokenize_ngrams(user_answer)
+        detected, missing = [], []
+        for i, key_point in enumerate(self.data["keypoints"]):
+            key_point_lower = key_point.lower()
+            if key_point_lower in user_answer:
+                detected.append(key_point)
+                continue
+            overlap = key_det.calculate_ngram_overlap(user_ngrams, key_point_lower)
+            similarity = float(self.key_point_max[i]) if self.windows else 0.0
+            if key_det.calculate_confidence_score(similarity, overlap) >= key_det.SIMILARITY_THRESHOLD:
+                detected.append(key_point)
+            else:
+                missing.append(key_point)
+
+        reference_scores = None
+        if self.reference_max is not None:
+            reference_scores = key_det.reference_scores(self.reference_max) if self.windows else {"max": 0.0, "softmax": 0.0}
+        return key_det.keypoint_result({**self.data, "user_answer": self.transcript}, detected, missing, reference_scores)
+
+
+# sessions of this process only, oldest first; untouched sessions expire after SESSION_TTL
+class MemorySessionStore:
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for session_id in [key for key, session in self.sessions.items() if now - session.touched > self.ttl]:
+                del self.sessions[session_id]
+
+    def create(self, session):
+        self.expire()
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session_id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session_id
+
+    # fn(session) on the stored session, None when the session is unknown
+    def update(self, session_id, fn):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        return None if session is None else fn(session)
+
+    def pop(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None)
+
+
+# sessions shared by every worker process: one document per session, expired by a mongo ttl index.
+# updates are compare-and-swap on a version number, so two workers never lose each other's chunks
+class MongoSessionStore:
+
+    def __init__(self, collection, ttl=SESSION_TTL):
+        self.collection = collection
+        self.ttl = ttl
+        self.indexed = False
+
+    def ensure_index(self):
+        if not self.indexed:
+            self.collection.create_index("updated_at", expireAfterSeconds=int(self.ttl), name="updated_at_ttl")
+            self.indexed = True
+
+    def create(self, session):
+        self.ensure_index()
+        session_id = uuid.uuid4().hex
+        self.collection.insert_one({"_id": session_id, "version": 0, "updated_at": datetime.now(timezone.utc), **session.state()})
+        return session_id
+
+    # load the session, apply fn(session) and write it back unless another worker changed it meanwhile
+    def update(self, session_id, fn):
+        for _ in range(UPDATE_RETRIES):
+            doc = self.collection.find_one({"_id": session_id})
+            if doc is None:
+                return None
+            session = ScoringSession.from_state(doc)
+            outcome = fn(session)
+            written = self.collection.update_one(
+                {"_id": session_id, "version": doc["version"]},
+                {"$set": {**session.state(), "updated_at": datetime.now(timezone.utc)}, "$inc": {"version": 1}},
+            )
+            if written.matched_count:
+                return outcome
+        raise SessionConflictError(f"scoring session {session_id} is updated concurrently, giving up")
+
+    def pop(self, session_id):
+        doc = self.collection.find_one_and_delete({"_id": session_id})
+        return None if doc is None else ScoringSession.from_state(doc)
+
+
+store = MemorySessionStore()
+
+# e.g. use_store(MongoSessionStore(client["questions"]["scoring_sessions"])) once per worker
+def use_store(session_store):
+    global store
+    store = session_store
+
+def create_session(data):
+    return store.create(ScoringSession(data))
+
+# (detection result so far, windows embedded) after adding a chunk, None when the session is unknown.
+# raises SessionFinalizedError once the session is finalized
+def add_chunk(session_id, text):
+    return store.update(session_id, lambda session: (session.add_chunk(text), session.windows))
+
+# (final detection result, windows embedded), the session stays open for /getFeedback
+def finalize(session_id):
+    return store.update(session_id, lambda session: (session.finalize(), session.windows))
+
+def close_session(session_id):
+    return store.pop(session_id)
+
+# (final result of a session for the answer submitted to /getFeedback, status), the result is None when
+# the session is unknown ("not_found", e.g. expired) or the answer is not a continuation of the
+# streamed transcript ("mismatch", e.g. edited by hand)
+def finalize_for_answer(session_id, user_answer):
+    session = close_session(session_id)
+    if session is None:
+        return None, "not_found"
+    streamed = " ".join(session.transcript.split())
+    answer = " ".join(str(user_answer or "").split())
+    if not answer.startswith(streamed):
+        return None, "mismatch"
+    # the session may have been finalized (POST .../finalize) before the answer was complete
+    tail = answer[len(streamed):]
+    if tail.strip():
+        session.reopen()
+        session.add_chunk(tail, separate=False)
+    return session.finalize(), "used"
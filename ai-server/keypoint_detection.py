@@ -1,72 +1,174 @@
-from sentence_transformers import SentenceTransformer, util
-from sklearn.feature_extraction.text import CountVectorizer
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import embedding_index
+import encoder
+import metrics
 
-# load sentence transformer model
-model = SentenceTransformer('all-mpnet-base-v2', device="cpu")
+# sentence transformer model is loaded lazily by encoder.py (backend picked with ENCODER_BACKEND)
+warm_up = encoder.warm_up
 
-# calculate user answer overlap on keypoints
-def calculate_ngram_overlap(user_answer, key_point):
-    if not user_answer.strip():
+# precomputed keypoint embeddings (see embedding_index.py), unseen keypoints are encoded and kept in an lru
+keypoint_index = embedding_index.EmbeddingIndex("keypoints", encoder.encode)
+
+# precomputed embeddings of every question's possible_answers, one row range per question
+reference_index = embedding_index.ReferenceIndex(encoder.encode)
+REFERENCE_TEMPERATURE = float(os.getenv("REFERENCE_SOFTMAX_TEMPERATURE", "0.1")) # lower is closer to the max
+
+# time spent per stage of a detection call, exported on /metrics
+stage_seconds = metrics.registry.histogram("keypoint_stage_seconds", "Time per keypoint detection stage", ("stage",))
+
+# a keypoint counts as detected when its confidence score reaches this threshold
+SIMILARITY_THRESHOLD = float(os.getenv("KEYPOINT_SIMILARITY_THRESHOLD", "0.6")) # adjust threshold for phrasing variations
+
+# how similarity and n-gram overlap are combined into the confidence score:
+#   legacy - grading before the real overlap: the old overlap was always 1.0, so a cosine of 0.2 passed at 0.6
+#   lift   - the overlap can only raise the semantic similarity, never pull it down (a semantic-only match
+#            needs a cosine of 0.6). stays opt-in until `check_encoder_backends.py --compare-rules` with the
+#            production model shows how many detections it costs
+CONFIDENCE_RULES = {
+    "legacy": lambda similarity, overlap: (similarity + 1.0) / 2,
+    "lift": lambda similarity, overlap: (similarity + max(similarity, overlap)) / 2,
+}
+CONFIDENCE_RULE = os.getenv("KEYPOINT_CONFIDENCE_RULE", "legacy")
+if CONFIDENCE_RULE not in CONFIDENCE_RULES:
+    raise ValueError(f"KEYPOINT_CONFIDENCE_RULE must be one of {sorted(CONFIDENCE_RULES)}, got {CONFIDENCE_RULE!r}")
+
+# same tokens sklearn's CountVectorizer uses: words of 2+ characters
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# unigrams and bigrams of a (lowercased) text
+def tokenize_ngrams(text):
+    tokens = TOKEN_PATTERN.findall(text)
+    return set(tokens).union(" ".join(pair) for pair in zip(tokens, tokens[1:]))
+
+# keypoints come from a fixed dataset, so their n-grams are only computed once
+@lru_cache(maxsize=4096)
+def keypoint_ngrams(key_point):
+    return frozenset(tokenize_ngrams(key_point))
+
+# calculate user answer overlap on keypoints: share of the keypoint n-grams found in the answer n-grams
+def calculate_ngram_overlap(user_ngrams, key_point):
+    key_ngrams = keypoint_ngrams(key_point)
+    if not user_ngrams or not key_ngrams:
         return 0  # no overlap
 
-    vectorizer = CountVectorizer(ngram_range=(1, 2)).fit([user_answer, key_point])
-    ngrams_user = set(vectorizer.get_feature_names_out())
-    ngrams_key = set(vectorizer.get_feature_names_out())
-    overlap = len(ngrams_user.intersection(ngrams_key)) / len(ngrams_key)
+    overlap = len(user_ngrams.intersection(key_ngrams)) / len(key_ngrams)
     return overlap
 
-# calculate confidence score based on similarity score and n-gram overlap
-def calculate_confidence_score(similarity_score, ngram_overlap):
-    return (similarity_score + ngram_overlap) / 2
+# calculate confidence score based on similarity score and n-gram overlap (see CONFIDENCE_RULES)
+def calculate_confidence_score(similarity_score, ngram_overlap, rule=None):
+    return CONFIDENCE_RULES[rule or CONFIDENCE_RULE](similarity_score, ngram_overlap)
 
-# detect matched and missing keypoints in the user answer
-def detect_keypoints(data):
-    # if user answer is empty
-    if not data["user_answer"].strip():
-        return {
-            "question_id": data["question_id"],
-            "question_level": data["question_level"],
-            "question": data["question"],
-            "keypoints": data["keypoints"],
-            "user_answer": data["user_answer"],
-            "detected_keypoints": [],
-            "missing_keypoints": data["keypoints"] # all keypoints are missing
-        }
-
-    # generate embeddings for key points and user answer
-    key_point_embeddings = model.encode(data["keypoints"], convert_to_tensor=True)
-    user_embedding = model.encode(data["user_answer"], convert_to_tensor=True)
-    
+# cosine similarity of one answer embedding against every keypoint embedding in one matrix product
+def cosine_similarities(user_embedding, key_point_embeddings):
+    key_point_embeddings = np.asarray(key_point_embeddings, dtype=np.float32)
+    if len(key_point_embeddings) == 0:
+        return np.zeros(0, dtype=np.float32)
+    user_embedding = np.asarray(user_embedding, dtype=np.float32)
+    key_norms = np.linalg.norm(key_point_embeddings, axis=1)
+    user_norm = np.linalg.norm(user_embedding)
+    return (key_point_embeddings @ user_embedding) / np.maximum(key_norms * user_norm, 1e-12)
+
+# similarity of one answer to a question's reference answers: the best match and a softmax-weighted
+# mean that also rewards matching several references, None when the question has no references
+def reference_similarity(user_embedding, reference_embeddings, temperature=REFERENCE_TEMPERATURE):
+    if reference_embeddings is None or len(reference_embeddings) == 0:
+        return None
+    if user_embedding is None:
+        return {"max": 0.0, "softmax": 0.0}
+
+    return reference_scores(cosine_similarities(user_embedding, reference_embeddings), temperature)
+
+# max and softmax-weighted mean of the similarities to each reference answer
+def reference_scores(similarities, temperature=REFERENCE_TEMPERATURE):
+    similarities = np.asarray(similarities, dtype=np.float64)
+    weights = np.exp((similarities - similarities.max()) / temperature)
+    softmax = float(weights @ similarities / weights.sum())
+    return {"max": round(float(similarities.max()), 4), "softmax": round(softmax, 4)}
+
+# build the detection result: the original data with detected and missing keypoints
+def keypoint_result(data, detected_key_points, missing_key_points, reference_scores=None):
+    return {
+        "question_id": data["question_id"],
+        "question_level": data["question_level"],
+        "question": data["question"],
+        "keypoints": data["keypoints"],
+        "user_answer": data["user_answer"],
+        "detected_keypoints": detected_key_points,
+        "missing_keypoints": missing_key_points,
+        "reference_similarity": reference_scores,
+    }
+
+# split keypoints into detected and missing using already computed embeddings
+def match_keypoints(data, key_point_embeddings, user_embedding, rule=None, threshold=None):
     # hybrid detection (keyword + semantic similarity + n-gram overlap)
-    similarity_threshold = 0.6  #  adjust threshold for phrasing variations
+    similarity_threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
     detected_key_points = []
     missing_key_points = []
 
+    # tokenize the answer once, and score every keypoint semantically at once
+    user_answer = data["user_answer"].lower()
+    user_ngrams = tokenize_ngrams(user_answer)
+    similarity_scores = cosine_similarities(user_embedding, key_point_embeddings)
+
     for i, key_point in enumerate(data["keypoints"]):
+        key_point_lower = key_point.lower()
         # check for exact keyword match
-        if key_point.lower() in data["user_answer"].lower():
+        if key_point_lower in user_answer:
             detected_key_points.append(key_point)
         else:
-            # check for semantic similarity
-            similarity_score = util.cos_sim(user_embedding, key_point_embeddings[i]).item()
             # check for n-gram overlap
-            ngram_overlap = calculate_ngram_overlap(data["user_answer"].lower(), key_point.lower())
+            ngram_overlap = calculate_ngram_overlap(user_ngrams, key_point_lower)
             # calculate confidence score
-            confidence_score = calculate_confidence_score(similarity_score, ngram_overlap)
+            confidence_score = calculate_confidence_score(float(similarity_scores[i]), ngram_overlap, rule)
             if confidence_score >= similarity_threshold:
                 detected_key_points.append(key_point)
             else:
                 missing_key_points.append(key_point)
 
-    # return the original data with detected and missing keypoints
-    result = {
-        "question_id": data["question_id"],
-        "question_level": data["question_level"],
-        "question": data["question"],
-        "keypoints": data["keypoints"],
-        "user_answer": data["user_answer"],
-        "detected_keypoints": detected_key_points,
-        "missing_keypoints": missing_key_points
-    }
-    
-    return result
\ No newline at end of file
+    return detected_key_points, missing_key_points
+
+# detect matched and missing keypoints in the user answer
+def detect_keypoints(data):
+    return detect_keypoints_batch([data])[0]
+
+# detect keypoints for a whole interview: all answers are encoded in one batch and
+# all keypoints are looked up together, then each answer is matched on its own
+def detect_keypoints_batch(items):
+    # answers that are empty skip the model entirely (all keypoints are missing)
+    answered = [i for i, data in enumerate(items) if data["user_answer"].strip()]
+
+    # generate embeddings for every user answer in one forward pass
+    user_embeddings = []
+    if answered:
+        with stage_seconds.time("encode_answers"):
+            user_embeddings = encoder.encode([items[i]["user_answer"] for i in answered])
+
+    # look up embeddings for every keypoint of every answered question at once
+    all_key_points = [key_point for i in answered for key_point in items[i]["keypoints"]]
+    with stage_seconds.time("keypoint_embeddings"):
+        all_key_point_embeddings = keypoint_index.lookup(all_key_points)
+
+    # reference answers of every answered question (slices of the memory-mapped table)
+    with stage_seconds.time("reference_embeddings"):
+        references = {i: reference_index.lookup(items[i]["question"], items[i].get("possible_answers")) for i in answered}
+
+    results = [None] * len(items)
+    offset = 0
+    with stage_seconds.time("match"): # cosine similarity + n-gram scoring
+        for n, i in enumerate(answered):
+            data = items[i]
+            count = len(data["keypoints"])
+            detected, missing = match_keypoints(data, all_key_point_embeddings[offset:offset + count], user_embeddings[n])
+            offset += count
+            results[i] = keypoint_result(data, detected, missing, reference_similarity(user_embeddings[n], references[i]))
+
+    # unanswered questions score 0 against their references, nothing has to be encoded for that
+    for i, data in enumerate(items):
+        if results[i] is None:
+            has_references = reference_index.has_references(data["question"], data.get("possible_answers"))
+            results[i] = keypoint_result(data, [], data["keypoints"], {"max": 0.0, "softmax": 0.0} if has_references else None)
+
+    return results
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# cache of llm responses keyed by a hash of the normalized prompt inputs
+#
+# a size bounded lru in memory, optionally backed by a sqlite file (LLM_CACHE_PATH) whose entries
+# expire after LLM_CACHE_TTL seconds, so identical inputs (retries, page reloads, empty answers,
+# common short answers) do not pay for another gemini round trip.
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") # no on-disk store when unset
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# lowercase and collapse whitespace so trivially different answers share a cache entry
+def normalize_text(text):
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+# sha256 of the canonical json of the key parts
+def make_key(**parts):
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# cache key for /getFeedback: the keypoint detection result plus the model
+# (kind="narrative" for the feedback text alone, see the local scoring mode)
+def feedback_key(prompt_data, model_name, kind="feedback"):
+    return make_key(
+        kind=kind,
+        model=model_name,
+        question_id=prompt_data.get("question_id"),
+        question=normalize_text(prompt_data.get("question")),
+        user_answer=normalize_text(prompt_data.get("user_answer")),
+        detected_keypoints=sorted(prompt_data.get("detected_keypoints", [])),
+        missing_keypoints=sorted(prompt_data.get("missing_keypoints", [])),
+    )
+
+# cache key for /getFacialFeedback: the posted (summary) data plus the model
+def facial_feedback_key(data, model_name):
+    return make_key(kind="facial_feedback", model=model_name, data=data)
+
+
+class LLMCache:
+
+    def __init__(self, max_entries=LLM_CACHE_SIZE, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict() # key -> (stored_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+            self.db.commit()
+
+    def expired(self, stored_at):
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    # cached value for a key, or None (counts a hit or a miss)
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.expired(entry[0]):
+                del self.entries[key]
+                entry = None
+
+            if entry is None and self.db is not None:
+                row = self.db.execute("SELECT stored_at, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if self.expired(row[0]):
+                        self.db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self.db.commit()
+                    else:
+                        entry = row
+                        self._remember(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        entry = (time.time(), value)
+        with self.lock:
+            self._remember(key, entry)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO llm_cache (key, value, stored_at) VALUES (?, ?, ?)", (key, value, entry[0]))
+                self.db.commit()
+
+    def _remember(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
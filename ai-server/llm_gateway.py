@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+
+# single entry point for every llm call made by the feedback endpoints
+#
+# calls run on one asyncio loop in a background thread and share one client per backend.
+# concurrency is bounded, every call has a per-attempt timeout and an overall deadline,
+# failures are retried with jittered exponential backoff, and concurrent identical prompts
+# are merged into one in-flight call (single flight).
+#
+# LLM_BACKEND picks the backend: gemini (default) or stub, a local http server that stands in
+# for gemini in tests and load benchmarks (see llm_stub_server.py).
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8500/generate")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5")) # max wait for a free slot
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "30"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60")) # overall time budget including retries
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5")) # base of the exponential backoff in seconds
+
+
+class LLMError(Exception):
+    pass
+
+class LLMTimeoutError(LLMError):
+    pass
+
+class LLMBusyError(LLMError):
+    pass
+
+
+# client errors (bad request, auth, not found) will not get better by retrying
+def is_retryable(error):
+    code = getattr(error, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+
+# google gemini through the official sdk, one GenerativeModel reused for every call
+class GeminiBackend:
+
+    def __init__(self, model_name=LLM_MODEL):
+        import google.generativeai as genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    async def generate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    # partial text as the model produces it
+    async def stream(self, prompt):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+# local stub: POST {"prompt": ...} to LLM_STUB_URL and read {"text": ...} back
+class StubBackend:
+
+    def __init__(self, url=LLM_STUB_URL, model_name=LLM_MODEL, timeout=LLM_ATTEMPT_TIMEOUT):
+        self.url = url
+        self.model_name = model_name
+        # the request runs in a worker thread that wait_for cannot cancel, so it needs its own timeout
+        # or a hung stub keeps the thread (and eventually the whole default executor) blocked
+        self.timeout = timeout
+
+    def _post(self, prompt):
+        body = json.dumps({"prompt": prompt, "model": self.model_name}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read())["text"]
+
+    async def generate(self, prompt):
+        return await asyncio.to_thread(self._post, prompt)
+
+    # the stub answers in one piece, hand it out in small chunks like a streaming model would
+    async def stream(self, prompt, chunk_size=64):
+        text = await self.generate(prompt)
+        for start in range(0, len(text), chunk_size):
+            yield text[start:start + chunk_size]
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+
+class LLMGateway:
+
+    def __init__(self, backend=None, max_concurrency=LLM_MAX_CONCURRENCY, queue_timeout=LLM_QUEUE_TIMEOUT,
+                 attempt_timeout=LLM_ATTEMPT_TIMEOUT, deadline=LLM_DEADLINE, retries=LLM_RETRIES, backoff=LLM_BACKOFF):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.inflight = {} # prompt hash -> task, only touched on the gateway loop
+        self.loop = None
+        self.semaphore = None
+        self.lock = threading.Lock()
+
+    @property
+    def model_name(self):
+        return getattr(self.get_backend(), "model_name", LLM_MODEL)
+
+    def get_backend(self):
+        if self.backend is None:
+            self.backend = BACKENDS[LLM_BACKEND]()
+        return self.backend
+
+    # start the background loop on first use
+    def get_loop(self):
+        if self.loop is None:
+            with self.lock:
+                if self.loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                    self.semaphore = asyncio.Semaphore(self.max_concurrency)
+                    self.loop = loop
+        return self.loop
+
+    # blocking call for flask views: returns the response text or raises LLMError
+    def generate(self, prompt, deadline=None):
+        deadline = deadline or self.deadline
+        future = asyncio.run_coroutine_threadsafe(self.generate_async(prompt, deadline), self.get_loop())
+        try:
+            return future.result(timeout=deadline + 1)
+        except TimeoutError:
+            future.cancel()
+            raise LLMTimeoutError(f"llm call did not finish within {deadline}s")
+
+    # several prompts at once (each with its own retries, all sharing the slots): a response text or the
+    # LLMError of every prompt, in order, so one failed prompt does not take the others down
+    def generate_many(self, prompts, deadline=None):
+        deadline = deadline or self.deadline
+
+        async def generate_all():
+            return await asyncio.gather(*(self.generate_async(prompt, deadline) for prompt in prompts), return_exceptions=True)
+
+        future = asyncio.run_coroutine_threadsafe(generate_all(), self.get_loop())
+        try:
+            results = future.result(timeout=deadline + 1)
+        except TimeoutError:
+            future.cancel()
+            raise LLMTimeoutError(f"llm calls did not finish within {deadline}s")
+        return [
+            result if isinstance(result, (str, LLMError)) else LLMError(f"llm call failed: {result!r}")
+            for result in results
+        ]
+
+    # identical prompts already in flight share the same call
+    async def generate_async(self, prompt, deadline):
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.call_with_retries(prompt, deadline))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def call_with_retries(self, prompt, deadline):
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        backend = self.get_backend()
+        attempt = 0
+
+        while True:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                raise LLMTimeoutError(f"llm call did not finish within {deadline}s")
+
+            # wait for a free slot, but give up quickly when the backend is saturated
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), min(self.queue_timeout, remaining))
+            except asyncio.TimeoutError:
+                raise LLMBusyError("too many llm calls in flight")
+
+            try:
+                return await asyncio.wait_for(backend.generate(prompt), min(self.attempt_timeout, end - loop.time()))
+            except Exception as e:
+                error = e
+            finally:
+                self.semaphore.release()
+
+            attempt += 1
+            if attempt > self.retries or not is_retryable(error):
+                if isinstance(error, asyncio.TimeoutError):
+                    raise LLMTimeoutError("llm call timed out") from error
+                raise LLMError(f"llm call failed: {error}") from error
+
+            # full jitter exponential backoff
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            print(f"[llm_gateway] attempt {attempt} failed ({error!r}), retrying in {delay:.2f}s")
+            await asyncio.sleep(min(delay, max(0.0, end - loop.time())))
+
+    # blocking generator for flask streaming responses: yields text chunks as the backend produces them.
+    # a stream is not retried (part of it may already be sent), but it has the same slots and deadline.
+    def stream(self, prompt, deadline=None):
+        deadline = deadline or self.deadline
+        chunks = queue.Queue()
+        done = object()
+        future = asyncio.run_coroutine_threadsafe(self.stream_async(prompt, deadline, chunks, done), self.get_loop())
+
+        end = time.monotonic() + deadline + 1
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=max(0.0, end - time.monotonic()))
+                except queue.Empty:
+                    raise LLMTimeoutError(f"llm stream did not finish within {deadline}s")
+                if chunk is done:
+                    break
+                yield chunk
+            future.result() # surface an error from the backend
+        finally:
+            future.cancel()
+
+    async def stream_async(self, prompt, deadline, chunks, done):
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), min(self.queue_timeout, deadline))
+        except asyncio.TimeoutError:
+            chunks.put(done)
+            raise LLMBusyError("too many llm calls in flight")
+
+        try:
+            async def relay():
+                async for chunk in self.get_backend().stream(prompt):
+                    chunks.put(chunk)
+            await asyncio.wait_for(relay(), max(0.0, end - loop.time()))
+        except asyncio.TimeoutError as e:
+            raise LLMTimeoutError(f"llm stream did not finish within {deadline}s") from e
+        except Exception as e:
+            raise LLMError(f"llm stream failed: {e}") from e
+        finally:
+            self.semaphore.release()
+            chunks.put(done)
+
+
+gateway = LLMGateway()
@@ -0,0 +1,69 @@
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# local stand-in for gemini, used with LLM_BACKEND=stub for tests and load benchmarks
+#
+#   python llm_stub_server.py --port 8500 --latency 0.8
+#
+# POST /generate {"prompt": ...} answers {"text": ...} after the configured latency, with canned
+# json in the shape the feedback endpoints expect (an array when the prompt asks for one).
+
+FEEDBACK = {
+    "feedback": "This is a stub feedback. Keep practicing.",
+    "rating": {"length": 5, "keypoints": 5},
+    "rating_average": 5,
+}
+FACIAL_FEEDBACK = {
+    "nonVerbalFeedack": {
+        "Confident": "This is a stub feedback.",
+        "Distracted": "This is a stub feedback.",
+        "Nervous": "This is a stub feedback.",
+    },
+    "nonVerbalScore": 5.0,
+}
+
+# canned answer for a prompt
+def stub_response(prompt):
+    if "feedback only, as plain text" in prompt:
+        return FEEDBACK["feedback"]
+    if "nonVerbalFeedback" in prompt:
+        return json.dumps(FACIAL_FEEDBACK)
+    match = re.search(r"json array with exactly (\d+) objects", prompt)
+    if match:
+        return json.dumps([FEEDBACK] * int(match.group(1)))
+    return "```json\n" + json.dumps(FEEDBACK) + "\n```"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+
+        body = json.dumps({"text": stub_response(payload.get("prompt", ""))}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub for the gemini api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"[llm_stub_server] listening on http://{args.host}:{args.port}/generate")
+    server.serve_forever()
@@ -0,0 +1,109 @@
+import os
+import random
+import threading
+import time
+from pymongo.errors import PyMongoError
+
+# in-memory question bank for /fetchQuestions
+#
+# the whole bank is loaded once into a (technicalDomain, questionLevel) -> question list index,
+# so sampling questions needs no mongo round trip. the index is rebuilt in the background when it
+# is older than QUESTION_BANK_TTL seconds, right away when a mongo change stream reports a write
+# (only available on replica sets), or when reload() is called from the admin endpoint.
+
+QUESTION_BANK_TTL = float(os.getenv("QUESTION_BANK_TTL", "300"))
+QUESTION_LEVELS = ("beginner", "intermediate", "advanced")
+QUESTION_COLLECTION = "question_bank" # one document per (domain, level, question_id), see util/db.py
+
+
+class QuestionBank:
+
+    def __init__(self, client, db_name="questions", ttl=QUESTION_BANK_TTL):
+        self.client = client
+        self.db_name = db_name
+        self.ttl = ttl
+        self.index = {} # (domain, level) -> list of questions
+        self.domains = frozenset()
+        self.loaded_at = None
+        self.reloading = False
+        self.lock = threading.Lock()
+
+    # read the bank once and swap in the new index (readers keep the old one until then)
+    def reload(self):
+        db = self.client[self.db_name]
+        index = {}
+
+        # one document per question, written by util/db.py
+        for doc in db[QUESTION_COLLECTION].find({}, {"_id": 0}):
+            domain = doc.pop("domain")
+            level = doc.pop("level")
+            index.setdefault((domain, level), []).append(doc)
+
+        # older databases: one collection per domain holding {"beginner": [...]} documents
+        if not index:
+            for domain in db.list_collection_names():
+                if domain == QUESTION_COLLECTION:
+                    continue
+                for doc in db[domain].find({}, {"_id": 0}):
+                    for level, questions in doc.items():
+                        # other lists (and other collections' documents) are not question groups
+                        if level in QUESTION_LEVELS and isinstance(questions, list):
+                            index.setdefault((domain, level), []).extend(questions)
+
+        self.index = index
+        self.domains = frozenset(domain for domain, _ in index)
+        self.loaded_at = time.time()
+        print(f"[question_bank] loaded {sum(len(q) for q in index.values())} questions in {len(index)} groups")
+        return len(index)
+
+    # reload in a background thread unless one is already running
+    def reload_async(self):
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+        threading.Thread(target=self._reload_in_background, daemon=True).start()
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        except PyMongoError as e:
+            print(f"[question_bank] reload failed: {e}")
+        finally:
+            self.reloading = False
+
+    # make sure there is an index: the first call loads synchronously, later calls refresh it in the background
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            with self.lock:
+                if self.loaded_at is None:
+                    self.reload()
+        elif self.ttl > 0 and time.time() - self.loaded_at > self.ttl:
+            self.reload_async()
+
+    def has_domain(self, domain):
+        self.ensure_loaded()
+        return domain in self.domains
+
+    # random sample of up to count questions, None if there is no such (domain, level)
+    def sample(self, domain, level, count):
+        self.ensure_loaded()
+        questions = self.index.get((domain, level))
+        if questions is None:
+            return None
+        return random.sample(questions, min(count, len(questions)))
+
+    # load in the background at startup and follow the change stream if mongo supports it
+    def start(self, watch=True):
+        self.reload_async()
+        if watch:
+            threading.Thread(target=self.watch, daemon=True).start()
+
+    # reload whenever a question collection changes (needs a replica set, otherwise we rely on the ttl)
+    def watch(self):
+        try:
+            with self.client[self.db_name].watch() as stream:
+                for _ in stream:
+                    self.reload_async()
+        except Exception as e:
+            print(f"[question_bank] change stream not available ({e}), refreshing every {self.ttl}s instead")
@@ -0,0 +1,56 @@
+import re
+
+# local, deterministic answer ratings computed from the keypoint detection result
+#
+# the same "rating" block the llm used to produce (length and keypoints out of 10, plus their
+# average), without an llm call, so scores are reproducible and cheap to serve.
+
+MIN_TARGET_WORDS = 20 # an answer this long (or longer) gets the full length score
+REFERENCE_LENGTH_FACTOR = 1.5 # when reference answers exist the target is this many times their average length
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def count_words(text):
+    return len(WORD_PATTERN.findall(text or ""))
+
+# number of words that earns a full length score for a question
+def target_words(possible_answers=None):
+    if possible_answers:
+        average = sum(count_words(answer) for answer in possible_answers) / len(possible_answers)
+        return max(MIN_TARGET_WORDS, round(average * REFERENCE_LENGTH_FACTOR))
+    return MIN_TARGET_WORDS
+
+# length score out of 10
+def length_score(user_answer, possible_answers=None):
+    words = count_words(user_answer)
+    return round(10 * min(1.0, words / target_words(possible_answers)))
+
+# keypoint coverage score out of 10
+def keypoint_score(detected_keypoints, keypoints):
+    if not keypoints:
+        return 10
+    return round(10 * len(detected_keypoints) / len(keypoints))
+
+# rating block for a detect_keypoints result (possible_answers from the question, when the client sends them)
+def score_answer(detection, possible_answers=None):
+    length = length_score(detection["user_answer"], possible_answers)
+    keypoints = keypoint_score(detection["detected_keypoints"], detection["keypoints"])
+    return {
+        "rating": {"length": length, "keypoints": keypoints},
+        "rating_average": (length + keypoints) / 2,
+    }
+
+# template feedback for the "fast" mode (no llm at all)
+def template_feedback(detection):
+    if not detection["user_answer"].strip():
+        return "You did not answer this question. Please answer again. Keep practicing."
+
+    parts = []
+    if detection["detected_keypoints"]:
+        parts.append("You covered: " + ", ".join(detection["detected_keypoints"]) + ".")
+    if detection["missing_keypoints"]:
+        parts.append("Your answer is missing: " + ", ".join(detection["missing_keypoints"]) + ".")
+    else:
+        parts.append("You covered all the key points of this question.")
+    parts.append("Keep practicing.")
+    return " ".join(parts)
@@ -1,20 +1,76 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 import keypoint_detection as key_det
+import incremental_scoring
+from question_bank import QuestionBank, QUESTION_LEVELS
+from llm_cache import LLMCache, feedback_key, facial_feedback_key
+from llm_gateway import gateway as llm_gateway, LLMError, LLMBusyError, LLM_MODEL
+import scoring
+import metrics
 import google.generativeai as genai
 import json
-import random
 import os
+import threading
+import time
 from flask_cors import CORS
 
 app = Flask(__name__)
 
-CORS(app)
+CORS(app, expose_headers=["X-Scoring-Session"])
 
 client = MongoClient("mongodb://localhost:27017/questions")
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+# responses for identical prompt inputs are served from here (see llm_cache.py)
+llm_cache = LLMCache()
+
+# load the sentence encoder in the background so importing the server does not block on it
+threading.Thread(target=key_det.warm_up, daemon=True).start()
+
+# request and stage timings plus llm cache stats, exported on /metrics
+request_seconds = metrics.registry.histogram("http_request_seconds", "Time per request (streams: until the response starts)", ("endpoint",))
+stage_seconds = metrics.registry.histogram("request_stage_seconds", "Time per request stage", ("endpoint", "stage"))
+llm_errors = metrics.registry.counter("llm_errors_total", "Failed llm calls by response status", ("status",))
+metrics.registry.gauge("llm_cache_hit_rate", "Share of llm cache lookups that were hits", lambda: llm_cache.stats()["hit_rate"])
+metrics.registry.gauge("llm_cache_hits", "Llm cache hits since start", lambda: llm_cache.hits)
+metrics.registry.gauge("llm_cache_misses", "Llm cache misses since start", lambda: llm_cache.misses)
+metrics.registry.gauge("llm_cache_entries", "Entries in the in-memory llm cache", lambda: len(llm_cache.entries))
+scoring_session_lookups = metrics.registry.counter("scoring_session_lookups_total", "Feedback requests with a scoring_session_id by outcome", ("result",))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if "request_start" in g:
+        request_seconds.observe(time.perf_counter() - g.request_start, request.endpoint or "unknown")
+    # whether a posted scoring_session_id was used (see detect_answer_keypoints)
+    if "scoring_session" in g:
+        response.headers["X-Scoring-Session"] = g.scoring_session
+    return response
+
+# prometheus metrics of this server
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+# question bank cached in memory, refreshed on a ttl / change stream (see question_bank.py)
+question_bank = QuestionBank(client)
+
+# scoring sessions are shared by every worker through mongo; SCORING_SESSION_STORE=memory keeps them
+# in this process, which only works with a single worker (or sticky routing by session id).
+# they live in their own database: the question bank watches and scans the whole questions database
+SCORING_SESSION_STORE = os.getenv("SCORING_SESSION_STORE", "mongo")
+SCORING_SESSION_DB = os.getenv("SCORING_SESSION_DB", "scoring")
+if SCORING_SESSION_STORE == "mongo":
+    incremental_scoring.use_store(incremental_scoring.MongoSessionStore(client[SCORING_SESSION_DB]["sessions"]))
+elif SCORING_SESSION_STORE != "memory":
+    raise ValueError(f"SCORING_SESSION_STORE must be mongo or memory, got {SCORING_SESSION_STORE!r}")
+question_bank.start()
+
 # fetching questions from database
 @app.route("/fetchQuestions", methods=["GET"])
 def get_questions():
@@ -22,54 +78,33 @@ def get_questions():
     questionLevel = request.args.get("questionLevel")
     noOfQuestions = int(request.args.get("noOfQuestions"))
     
-    db = client["questions"]
-    
-    if technicalDomain in db.list_collection_names():
-        
-        collection = db[technicalDomain]
-        
-        if(questionLevel == "beginner"):
-            for q in collection.find():
-                try:
-                    random_questions = random.sample(q[questionLevel], noOfQuestions)
-                    return jsonify(random_questions)         
-                except KeyError as e:
-                    pass
-        elif(questionLevel == "intermediate"):
-            for q in collection.find():
-                try:
-                    random_questions = random.sample(q[questionLevel], noOfQuestions)
-                    return jsonify(random_questions)               
-                except KeyError as e:
-                    pass
-        elif(questionLevel == "advanced"):
-            for q in collection.find():
-                try:
-                    random_questions = random.sample(q[questionLevel], noOfQuestions)
-                    return jsonify(random_questions)          
-                except KeyError as e:
-                    pass
-        else: 
-            return jsonify({"error": "There is no such question level!!"}), 400
-    else:
+    if not question_bank.has_domain(technicalDomain):
         return jsonify({"error": "There is no such question category"}), 400 
-    
-# getting feedback on verbal data
-@app.route("/getFeedback", methods=["POST"])
-def getFeedback():
-    data = request.get_json()
-    # detected keypoints
-    prompt_data = key_det.detect_keypoints(data)
 
-    # send data to GEMINI API
-    prompt = f"""
+    random_questions = None
+    if questionLevel in QUESTION_LEVELS:
+        with stage_seconds.time("get_questions", "sample"):
+            random_questions = question_bank.sample(technicalDomain, questionLevel, noOfQuestions)
+    if random_questions is None:
+        return jsonify({"error": "There is no such question level!!"}), 400
 
-    As an AI assistant, anaylze the userData and give feedback to the user
+    return jsonify(random_questions)
 
-    {prompt_data}
-
-    The output should be in json format like this
+# reload the question bank after the datasets were updated
+@app.route("/admin/reloadQuestions", methods=["POST"])
+def reload_questions():
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if admin_token:
+        if request.headers.get("X-Admin-Token") != admin_token:
+            return jsonify({"error": "forbidden"}), 403
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "forbidden"}), 403
 
+    groups = question_bank.reload()
+    return jsonify({"reloaded": groups})
+    
+# output format the model has to follow for every answer it gives feedback on
+FEEDBACK_FORMAT = """
     previous data like
     "question_id": <integer>, // question id from the question_db
     "question_level": <string>, // level of the question
@@ -87,16 +122,380 @@ def getFeedback():
     "rating_average": length + keypoints / 2
     """
 
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    response = model.generate_content(prompt)
-    cleaned_response = (response.text).replace("```json","").replace("```","").strip()
+# max answers packed into a single gemini request by /getFeedbackBatch
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "10"))
+
+# prompt asking for feedback on a single answer
+def feedback_prompt(prompt_data):
+    return f"""
+
+    As an AI assistant, anaylze the userData and give feedback to the user
+
+    {prompt_data}
+
+    The output should be in json format like this
+{FEEDBACK_FORMAT}"""
+
+# /getFeedback mode, from ?mode= or "scoring_mode" in the body:
+#   llm   - gemini writes the feedback and the ratings (default)
+#   local - ratings are computed locally (scoring.py), gemini only writes the feedback text
+#   fast  - ratings and a template feedback are computed locally, no llm call at all
+FEEDBACK_MODES = ("llm", "local", "fast")
+FEEDBACK_MODE = os.getenv("FEEDBACK_MODE", "llm")
+
+# prompt asking only for the narrative feedback, the ratings are computed locally
+def narrative_prompt(prompt_data):
+    return f"""
+
+    As an AI assistant, anaylze the userData and give feedback to the user
+
+    {prompt_data}
+
+    If the user don't provide any response then tell him to answer again. If the user answered the questions, give a detailed feedback on the answer and the missing_keypoints. Ignore any gramatical mistakes, also in the answer if it is required to answer some symbol like syntax the user will answer equivalent keyword for example / slash so ignore this edge case. Also after giving feedback give reply like keep practicing.
+    Reply with the feedback only, as plain text with no formatting."""
+
+# strip the ```json fences gemini puts around its answers
+def clean_llm_response(text):
+    return text.replace("```json","").replace("```","").strip()
+
+# every llm call goes through the gateway (shared client, bounded concurrency, deadlines, retries)
+def llm_generate(prompt):
+    with stage_seconds.time(request.endpoint or "unknown", "llm"):
+        return clean_llm_response(llm_gateway.generate(prompt))
+
+# json error for a failed llm call: 503 when saturated, 504 otherwise
+def llm_error_response(error):
+    print("LLM call failed:", error)
+    status = 503 if isinstance(error, LLMBusyError) else 504
+    llm_errors.inc(1, str(status))
+    return jsonify({"error": "feedback service unavailable, please try again", "detail": str(error)}), status
+
+# only well formed json answers are worth caching
+def is_json(text):
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+# scoring sessions: keypoint detection runs on transcript chunks while the candidate is answering
+# (see incremental_scoring.py), /getFeedback then only finalizes it when given the scoring_session_id
+@app.route("/scoringSession", methods=["POST"])
+def create_scoring_session():
+    data = request.get_json()
+    if not isinstance(data, dict) or not data.get("question"):
+        return jsonify({"error": "question is required"}), 400
+    return jsonify({"session_id": incremental_scoring.create_session(data)}), 201
+
+# 409 when other requests kept changing the session (the client may retry), 503 when the store is down
+def scoring_session_error_response(error):
+    print("Scoring session update failed:", error)
+    if isinstance(error, incremental_scoring.SessionConflictError):
+        return jsonify({"error": "scoring session is being updated by another request, please retry"}), 409
+    return jsonify({"error": "scoring sessions are unavailable, please try again"}), 503
+
+# add a transcript chunk, answers the detection result so far
+@app.route("/scoringSession/<session_id>/chunk", methods=["POST"])
+def add_scoring_chunk(session_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        with stage_seconds.time("scoringSession", "chunk"):
+            outcome = incremental_scoring.add_chunk(session_id, str(data.get("text", "")))
+    except incremental_scoring.SessionFinalizedError:
+        return jsonify({"error": "scoring session is already finalized, post the answer to /getFeedback"}), 409
+    except (incremental_scoring.SessionConflictError, PyMongoError) as e:
+        return scoring_session_error_response(e)
+    if outcome is None:
+        return jsonify({"error": "unknown scoring session"}), 404
+    result, windows = outcome
+    return jsonify({**result, "session_id": session_id, "windows": windows})
+
+# embed what is left and return the final detection result (the session stays open for /getFeedback)
+@app.route("/scoringSession/<session_id>/finalize", methods=["POST"])
+def finalize_scoring_session(session_id):
+    try:
+        with stage_seconds.time("scoringSession", "finalize"):
+            outcome = incremental_scoring.finalize(session_id)
+    except (incremental_scoring.SessionConflictError, PyMongoError) as e:
+        return scoring_session_error_response(e)
+    if outcome is None:
+        return jsonify({"error": "unknown scoring session"}), 404
+    result, windows = outcome
+    return jsonify({**result, "session_id": session_id, "windows": windows})
+
+# keypoints of a posted answer: from its scoring session when the answer was streamed, otherwise from scratch.
+# the X-Scoring-Session response header tells the client whether its session was used
+# ("used") or the answer was scored from scratch ("not_found": unknown/expired, "mismatch": edited answer,
+# "unavailable": the session store failed)
+def detect_answer_keypoints(data):
+    if data.get("scoring_session_id"):
+        try:
+            result, status = incremental_scoring.finalize_for_answer(data["scoring_session_id"], data.get("user_answer"))
+        except PyMongoError as e:
+            print("Scoring session lookup failed:", e)
+            result, status = None, "unavailable"
+        g.scoring_session = status
+        scoring_session_lookups.inc(1, status)
+        if result is not None:
+            return result
+        print(f"Scoring session {data['scoring_session_id']} {status}, detecting keypoints from scratch")
+    return key_det.detect_keypoints(data)
+
+# getting feedback on verbal data
+@app.route("/getFeedback", methods=["POST"])
+def getFeedback():
+    data = request.get_json()
+    mode = request.args.get("mode") or data.get("scoring_mode") or FEEDBACK_MODE
+    if mode not in FEEDBACK_MODES:
+        return jsonify({"error": f"unknown mode {mode!r}, expected one of {list(FEEDBACK_MODES)}"}), 400
+
+    # detected keypoints
+    with stage_seconds.time("getFeedback", "keypoints"):
+        prompt_data = detect_answer_keypoints(data)
+    if mode != "llm":
+        return local_feedback(prompt_data, data.get("possible_answers"), mode)
+
+    # identical inputs were already answered
+    cache_key = feedback_key(prompt_data, LLM_MODEL)
+    cached_response = llm_cache.get(cache_key)
+    if cached_response is not None:
+        print("Response from LLM cache:", cached_response)
+        return cached_response
+
+    # send data to GEMINI API
+    prompt = feedback_prompt(prompt_data)
+
+    try:
+        cleaned_response = llm_generate(prompt)
+    except LLMError as e:
+        return llm_error_response(e)
     print("Response from Gemini API:", cleaned_response)
+    # only a feedback object is worth caching (the stream and batch endpoints serve it as their result)
+    if parse_feedback(cleaned_response, prompt_data) is not None:
+        llm_cache.put(cache_key, cleaned_response)
     return cleaned_response
 
+# the model sometimes answers in the json format anyway, keep only the feedback text then
+def narrative_text(text):
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return text
+    return parsed.get("feedback", text) if isinstance(parsed, dict) else text
+
+# feedback with locally computed ratings, the llm (if at all) only writes the feedback text
+def local_feedback(prompt_data, possible_answers, mode):
+    with stage_seconds.time("getFeedback", "scoring"):
+        scores = scoring.score_answer(prompt_data, possible_answers)
+    if mode == "fast":
+        return jsonify({**prompt_data, "feedback": scoring.template_feedback(prompt_data), **scores})
+
+    cache_key = feedback_key(prompt_data, LLM_MODEL, kind="narrative")
+    feedback = llm_cache.get(cache_key)
+    if feedback is None:
+        try:
+            feedback = narrative_text(llm_generate(narrative_prompt(prompt_data)))
+            llm_cache.put(cache_key, feedback)
+        except LLMError as e:
+            # the scores do not depend on the llm, serve them with the template feedback
+            print("LLM call failed, using template feedback:", e)
+            feedback = scoring.template_feedback(prompt_data)
+    return jsonify({**prompt_data, "feedback": feedback, **scores})
+
+# format one server-sent event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# parse the complete model output into the feedback object, None if it is not valid
+def parse_feedback(text, prompt_data):
+    try:
+        feedback = json.loads(clean_llm_response(text))
+    except ValueError:
+        return None
+    if not isinstance(feedback, dict) or "feedback" not in feedback:
+        return None
+    return {**prompt_data, **feedback}
+
+# getting feedback on verbal data as server-sent events:
+#   keypoints - locally detected/missing keypoints, sent before the llm is called
+#   delta     - {"text": ...} partial model output as it is generated
+#   result    - the validated feedback object (same shape as /getFeedback)
+#   error     - {"error": ...} if the model failed or returned invalid json
+@app.route("/getFeedbackStream", methods=["POST"])
+def getFeedbackStream():
+    data = request.get_json()
+    # detected keypoints
+    prompt_data = detect_answer_keypoints(data)
+    cache_key = feedback_key(prompt_data, LLM_MODEL)
+
+    def events():
+        yield sse_event("keypoints", prompt_data)
+
+        # cached answers are validated like fresh ones, an invalid entry is answered by the model again
+        cached_response = llm_cache.get(cache_key)
+        if cached_response is not None:
+            feedback = parse_feedback(cached_response, prompt_data)
+            if feedback is not None:
+                yield sse_event("result", feedback)
+                return
+
+        text = []
+        try:
+            for chunk in llm_gateway.stream(feedback_prompt(prompt_data)):
+                text.append(chunk)
+                yield sse_event("delta", {"text": chunk})
+        except LLMError as e:
+            print("LLM stream failed:", e)
+            yield sse_event("error", {"error": "feedback service unavailable, please try again"})
+            return
+
+        feedback = parse_feedback("".join(text), prompt_data)
+        if feedback is None:
+            yield sse_event("error", {"error": "invalid feedback from the model, please try again"})
+            return
+        llm_cache.put(cache_key, json.dumps(feedback))
+        yield sse_event("result", feedback)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# getting feedback on every answer of an interview at once
+@app.route("/getFeedbackBatch", methods=["POST"])
+def getFeedbackBatch():
+    data = request.get_json()
+    answers = data.get("answers") if isinstance(data, dict) else data
+    if not isinstance(answers, list) or not answers:
+        return jsonify({"error": "answers should be a non empty list"}), 400
+    for i, answer in enumerate(answers):
+        if not isinstance(answer, dict) or not isinstance(answer.get("user_answer"), str) or not isinstance(answer.get("keypoints"), list):
+            return jsonify({"error": f"answers[{i}] should be an object with user_answer and keypoints"}), 400
+        if any(field not in answer for field in ANSWER_FIELDS):
+            return jsonify({"error": f"answers[{i}] should have the fields {list(ANSWER_FIELDS)}"}), 400
+
+    # detect keypoints for all answers with one batched encode
+    prompt_data = key_det.detect_keypoints_batch(answers)
+
+    # answers seen before come from the cache, only the rest go to gemini
+    results = [None] * len(prompt_data)
+    cache_keys = [feedback_key(item, LLM_MODEL) for item in prompt_data]
+    for i, cache_key in enumerate(cache_keys):
+        cached_response = llm_cache.get(cache_key)
+        if cached_response is not None:
+            cached = parse_feedback(cached_response, {})
+            if cached is not None and valid_feedback(cached, prompt_data[i]):
+                results[i] = cached
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    errors = []
+    for start in range(0, len(pending), FEEDBACK_BATCH_SIZE):
+        chunk = pending[start:start + FEEDBACK_BATCH_SIZE]
+        feedback = feedback_for_chunk([prompt_data[i] for i in chunk])
+        for i, result in zip(chunk, feedback):
+            if isinstance(result, LLMError):
+                errors.append(result)
+                results[i] = {"question_id": prompt_data[i]["question_id"], "error": "feedback service unavailable, please try again", "detail": str(result)}
+                continue
+            results[i] = result
+            llm_cache.put(cache_keys[i], json.dumps(result))
+
+    # nothing to show at all: fail like /getFeedback does
+    if errors and len(errors) == len(results):
+        return llm_error_response(errors[0])
+    return jsonify(results)
+
+# fields every /getFeedbackBatch answer needs for keypoint detection
+ANSWER_FIELDS = ("question_id", "question_level", "question", "keypoints", "user_answer")
+
+# a feedback object of the model for this answer: a dict with feedback, and (when the position in a batch
+# reply is all that links them, or the model sent one) the question_id of the answer
+def valid_feedback(feedback, item, require_question_id=False):
+    if not isinstance(feedback, dict) or "feedback" not in feedback:
+        return False
+    if "question_id" not in feedback:
+        return not require_question_id
+    return str(feedback["question_id"]) == str(item["question_id"])
+
+# feedback for several answers: one gemini request for the chunk (a json array in the same order), answers
+# the model got wrong are asked for separately and concurrently. returns a feedback object or LLMError per answer
+def feedback_for_chunk(chunk):
+    prompt = f"""
+
+    As an AI assistant, anaylze each userData in the list below and give feedback to the user for every one of them
+
+    {json.dumps(chunk)}
+
+    The output should be a json array with exactly {len(chunk)} objects, in the same order as the list above, every object in json format like this
+{FEEDBACK_FORMAT}"""
+
+    feedback = [None] * len(chunk)
+    try:
+        batch = json.loads(llm_generate(prompt))
+    except (LLMError, ValueError) as e:
+        print("Batch request to Gemini API failed, retrying one by one:", e)
+        batch = None
+    if isinstance(batch, list) and len(batch) == len(chunk):
+        for i, (result, item) in enumerate(zip(batch, chunk)):
+            if valid_feedback(result, item, require_question_id=True):
+                feedback[i] = result
+
+    # answers without a valid object in the batch reply are asked for one by one, all at once
+    retry = [i for i, result in enumerate(feedback) if result is None]
+    if retry:
+        print(f"Batch response from Gemini API did not cover {len(retry)} of {len(chunk)} answers, retrying them one by one")
+        with stage_seconds.time(request.endpoint or "unknown", "llm"):
+            responses = llm_gateway.generate_many([feedback_prompt(chunk[i]) for i in retry])
+        for i, response in zip(retry, responses):
+            if isinstance(response, LLMError):
+                feedback[i] = response
+                continue
+            try:
+                result = json.loads(clean_llm_response(response))
+            except ValueError:
+                result = None
+            feedback[i] = result if valid_feedback(result, chunk[i]) else LLMError("invalid feedback from the model")
+
+    return feedback
+
+# fields of the /ws session summary that go into the non-verbal prompt (its size does not grow with the interview)
+SESSION_SUMMARY_FIELDS = [
+    "duration_seconds",
+    "eye_direction_share",
+    "head_direction_share",
+    "speaking_ratio",
+    "gaze_deviation_bins",
+    "gaze_horizontal_deviation_hist",
+    "gaze_vertical_deviation_hist",
+    "longest_eye_streak_seconds",
+    "longest_head_streak_seconds",
+]
+
+def compact_session_summary(summary):
+    compact = {field: summary[field] for field in SESSION_SUMMARY_FIELDS if field in summary}
+    compact["description"] = (
+        "summary of the whole interview: share of time spent in each eye and head direction, "
+        "share of time speaking, histograms of how far the gaze moved from the calibrated center "
+        "and the longest uninterrupted time in each direction (seconds)"
+    )
+    return compact
+
 # getting feedback on non-verbal data
 @app.route("/getFacialFeedback", methods=["POST"])
 def getFacialFeedback():
     data = request.get_json()
+
+    # prefer the fixed size session summary from the /ws server over raw per-frame data
+    if isinstance(data, dict) and isinstance(data.get("sessionSummary"), dict):
+        data = compact_session_summary(data["sessionSummary"])
+
+    # identical data was already answered
+    cache_key = facial_feedback_key(data, LLM_MODEL)
+    cached_response = llm_cache.get(cache_key)
+    if cached_response is not None:
+        print("Response from LLM cache:", cached_response)
+        return cached_response
     
     prompt = f"""
         As an AI assistant, anaylze the userData and give feedback to the user
@@ -117,10 +516,13 @@ def getFacialFeedback():
         
     """
 
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    response = model.generate_content(prompt)
-    cleaned_response = (response.text).replace("```json","").replace("```","").strip()
+    try:
+        cleaned_response = llm_generate(prompt)
+    except LLMError as e:
+        return llm_error_response(e)
     print("Response from Gemini API:", cleaned_response)
+    if is_json(cleaned_response):
+        llm_cache.put(cache_key, cleaned_response)
     return cleaned_response
 
 if __name__ == "__main__":
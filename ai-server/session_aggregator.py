@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# constant-memory running aggregates of the /ws analysis results, keyed by interview session id
+#
+# every analyzed frame updates a handful of counters (time per eye/head direction, speaking time,
+# gaze deviation histograms, longest streaks), so a summary costs the same no matter how long the
+# interview ran. /getFacialFeedback takes that summary instead of raw per-frame data.
+
+MAX_SESSIONS = int(os.getenv("MAX_AGGREGATED_SESSIONS", "10000")) # summaries kept in memory (oldest evicted)
+MAX_FRAME_GAP = 1.0 # seconds, longer gaps between frames (reconnects, stalls) are not counted as time
+
+# edges of the gaze deviation histograms (smoothed eye ratio minus calibrated center)
+DEVIATION_EDGES = (-0.16, -0.08, -0.04, 0.04, 0.08, 0.16)
+DEVIATION_LABELS = ("<-0.16", "-0.16..-0.08", "-0.08..-0.04", "-0.04..0.04", "0.04..0.08", "0.08..0.16", ">0.16")
+
+# index of the histogram bin a deviation falls into
+def deviation_bin(value):
+    for i, edge in enumerate(DEVIATION_EDGES):
+        if value < edge:
+            return i
+    return len(DEVIATION_EDGES)
+
+
+# current and longest run of the same state (in seconds) for one signal
+class StreakTracker:
+
+    def __init__(self):
+        self.state = None
+        self.length = 0.0
+        self.longest = {} # state -> longest streak in seconds
+
+    def update(self, state, dt):
+        if state != self.state:
+            self.state = state
+            self.length = 0.0
+        self.length += dt
+        if self.length > self.longest.get(state, 0.0):
+            self.longest[state] = self.length
+
+
+class SessionAggregator:
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.started_at = None
+        self.last_at = None
+        self.frames = 0
+        self.error_frames = 0 # frames that could not be analyzed (e.g. bad_image), not counted as time
+        self.duration = 0.0 # seconds of analyzed video
+        self.eye_time = {} # eye_direction -> seconds
+        self.head_time = {} # head_direction -> seconds
+        self.mouth_time = {"Speaking": 0.0, "Silent": 0.0}
+        self.horizontal_hist = [0] * len(DEVIATION_LABELS)
+        self.vertical_hist = [0] * len(DEVIATION_LABELS)
+        self.eye_streaks = StreakTracker()
+        self.head_streaks = StreakTracker()
+
+    # add one /ws analysis result, now = time the frame was analyzed
+    def update(self, response, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = now
+                dt = 0.0
+            else:
+                dt = min(max(now - self.last_at, 0.0), MAX_FRAME_GAP)
+            self.last_at = now
+            self.frames += 1
+            # the shares of every state add up to 1, so time without a result is left out of the duration
+            if response.get("error") is not None:
+                self.error_frames += 1
+                return
+            self.duration += dt
+
+            eye = response.get("eye_direction")
+            head = response.get("head_direction")
+            if eye is not None:
+                self.eye_time[eye] = self.eye_time.get(eye, 0.0) + dt
+                self.eye_streaks.update(eye, dt)
+            if head is not None:
+                self.head_time[head] = self.head_time.get(head, 0.0) + dt
+                self.head_streaks.update(head, dt)
+
+            mouth = response.get("mouth_state")
+            if mouth in self.mouth_time:
+                self.mouth_time[mouth] += dt
+
+            # gaze deviation from the calibrated center (only once calibration is done)
+            if response.get("center_horizontal") is not None and "smoothed_horizontal" in response:
+                self.horizontal_hist[deviation_bin(response["smoothed_horizontal"] - response["center_horizontal"])] += 1
+                self.vertical_hist[deviation_bin(response["smoothed_vertical"] - response["center_vertical"])] += 1
+
+    # compact summary: fixed size regardless of interview length
+    def summary(self):
+        with self.lock:
+            duration = self.duration
+            mouth_total = self.mouth_time["Speaking"] + self.mouth_time["Silent"]
+
+            def shares(times):
+                return {state: round(seconds / duration, 4) if duration else 0.0 for state, seconds in times.items()}
+
+            def rounded(times):
+                return {state: round(seconds, 2) for state, seconds in times.items()}
+
+            return {
+                "session_id": self.session_id,
+                "frames": self.frames,
+                "error_frames": self.error_frames,
+                "duration_seconds": round(duration, 2),
+                "eye_direction_seconds": rounded(self.eye_time),
+                "eye_direction_share": shares(self.eye_time),
+                "head_direction_seconds": rounded(self.head_time),
+                "head_direction_share": shares(self.head_time),
+                "speaking_ratio": round(self.mouth_time["Speaking"] / mouth_total, 4) if mouth_total else 0.0,
+                "gaze_deviation_bins": list(DEVIATION_LABELS),
+                "gaze_horizontal_deviation_hist": list(self.horizontal_hist),
+                "gaze_vertical_deviation_hist": list(self.vertical_hist),
+                "longest_eye_streak_seconds": rounded(self.eye_streaks.longest),
+                "longest_head_streak_seconds": rounded(self.head_streaks.longest),
+            }
+
+
+# session id -> aggregator, a reconnecting client keeps adding to the same session
+sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def get_or_create(session_id):
+    with _sessions_lock:
+        aggregator = sessions.get(session_id)
+        if aggregator is None:
+            aggregator = SessionAggregator(session_id)
+            sessions[session_id] = aggregator
+        sessions.move_to_end(session_id)
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+        return aggregator
+
+def get_summary(session_id):
+    aggregator = sessions.get(session_id)
+    return aggregator.summary() if aggregator is not None else None
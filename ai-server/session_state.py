@@ -0,0 +1,108 @@
+import os
+import time
+from collections import deque
+from frame_preprocessing import FramePreprocessor
+from facial_metrics import PoseTracker
+
+# per websocket client tracking state with constant work and memory per frame
+#
+# smoothing keeps a running sum over a fixed window and calibration keeps running sums instead of
+# a list of samples, so a frame never calls numpy on tiny arrays or rebuilds lists. sessions that
+# stop sending frames (e.g. half-open sockets) are evicted by find_idle (see the reaper in script.py).
+
+CALIBRATION_SECONDS = 3.0 # calibration time
+CALIBRATION_MAX_SAMPLES = 40 # calibration also ends after this many samples
+HISTORY_LEN = 8  # number of recent measurements to average (for smoothing)
+SESSION_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60")) # seconds without a frame before a session is evicted
+RESYNC_EVERY = 1024 # recompute a running sum from its window this often to stop floating point drift
+
+
+# mean of the last `size` values, O(1) per update
+class RollingMean:
+    __slots__ = ("values", "total", "updates")
+
+    def __init__(self, size=HISTORY_LEN):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.updates = 0
+
+    def add(self, value):
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0:
+            self.total = sum(self.values)
+        return self.total / len(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class SessionState:
+    __slots__ = (
+        "id",             # unique client ID
+        "horizontal",     # recent horizontal eye positions
+        "vertical",       # recent vertical eye positions
+        "mouth",          # recent mouth opening percentages
+        "calibrating",    # whether still calibrating
+        "calib_start",    # when calibration started
+        "calib_count",    # eye positions seen during calibration
+        "calib_sum_h",    # sum of horizontal positions during calibration
+        "calib_sum_v",    # sum of vertical positions during calibration
+        "center_h",       # calibrated center horizontal position
+        "center_v",       # calibrated center vertical position
+        "frames_dropped", # frames replaced by a newer one before analysis
+        "preprocessor",   # downscaling and face crop from the previous frame
+        "pose",           # head pose warm start / motion gate from the previous frame
+        "aggregator",     # running aggregates of the interview session
+        "last_seen",      # monotonic time of the last received frame
+        "receiver",       # task receiving frames, cancelled to evict the session
+    )
+
+    def __init__(self, client_id=None, now=None, preprocessor=None):
+        self.id = client_id
+        self.horizontal = RollingMean()
+        self.vertical = RollingMean()
+        self.mouth = RollingMean()
+        self.calibrating = True
+        self.calib_start = time.time() if now is None else now
+        self.calib_count = 0
+        self.calib_sum_h = 0.0
+        self.calib_sum_v = 0.0
+        self.center_h = None
+        self.center_v = None
+        self.frames_dropped = 0
+        self.preprocessor = preprocessor if preprocessor is not None else FramePreprocessor()
+        self.pose = PoseTracker()
+        self.aggregator = None
+        self.last_seen = time.monotonic()
+        self.receiver = None
+
+    # add a calibration sample; returns the elapsed calibration time, calibration ends after
+    # CALIBRATION_SECONDS or CALIBRATION_MAX_SAMPLES samples (calibrating is False afterwards)
+    def add_calibration_sample(self, h_ratio, v_ratio, now=None):
+        self.calib_count += 1
+        self.calib_sum_h += h_ratio
+        self.calib_sum_v += v_ratio
+        elapsed = (time.time() if now is None else now) - self.calib_start
+
+        if elapsed >= CALIBRATION_SECONDS or self.calib_count >= CALIBRATION_MAX_SAMPLES:
+            # average eye position during calibration
+            self.center_h = self.calib_sum_h / self.calib_count
+            self.center_v = self.calib_sum_v / self.calib_count
+            self.calibrating = False
+        return elapsed
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def idle_seconds(self, now=None):
+        return (time.monotonic() if now is None else now) - self.last_seen
+
+
+# keys of the sessions that received nothing for longer than timeout seconds
+def find_idle(sessions, timeout=SESSION_IDLE_TIMEOUT, now=None):
+    now = time.monotonic() if now is None else now
+    return [key for key, state in sessions.items() if state.idle_seconds(now) > timeout]
@@ -0,0 +1,37 @@
+import os
+import re
+import sys
+import zlib
+import numpy as np
+import pytest
+
+# the server modules are flat scripts in ai-server/, import them the same way the servers do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# bag of hashed words instead of the sentence transformer: texts sharing words are similar
+def hashed_words(texts, backend=None, batch_size=32):
+    single = isinstance(texts, str)
+    vectors = np.zeros((1 if single else len(texts), 64), dtype=np.float32)
+    for row, text in enumerate([texts] if single else texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[row, zlib.crc32(word.encode("utf-8")) % 64] += 1
+    return vectors[0] if single else vectors
+
+# keypoint detection with hashed_words and empty embedding indexes (no model, no precomputed tables)
+@pytest.fixture
+def fake_encoder(monkeypatch, tmp_path):
+    import embedding_index
+    import encoder
+    import keypoint_detection
+
+    monkeypatch.setattr(encoder, "encode", hashed_words)
+    monkeypatch.setattr(keypoint_detection, "keypoint_index", embedding_index.EmbeddingIndex("keypoints", hashed_words, index_dir=str(tmp_path)))
+    monkeypatch.setattr(keypoint_detection, "reference_index", embedding_index.ReferenceIndex(hashed_words, index_dir=str(tmp_path)))
+    return hashed_words
+
+# the flask server module, skipped where its dependencies are not installed
+@pytest.fixture
+def server():
+    pytest.importorskip("google.generativeai")
+    return pytest.importorskip("server")
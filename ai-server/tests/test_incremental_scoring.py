@@ -0,0 +1,111 @@
+import mongomock
+import pytest
+import incremental_scoring
+import keypoint_detection as key_det
+from incremental_scoring import MemorySessionStore, MongoSessionStore, SessionConflictError, SessionFinalizedError
+
+# scoring sessions over both stores, with the hashed-words encoder of conftest.py
+
+QUESTION = {
+    "question_id": 1,
+    "question_level": "beginner",
+    "question": "What is a list?",
+    "keypoints": ["mutable", "ordered"],
+}
+STREAMED = "A list is a collection."
+ANSWER = "A list is a collection. It is mutable and ordered."
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def store(request, fake_encoder, monkeypatch):
+    if request.param == "memory":
+        store = MemorySessionStore()
+    else:
+        store = MongoSessionStore(mongomock.MongoClient()["scoring"]["sessions"])
+    monkeypatch.setattr(incremental_scoring, "store", store)
+    return store
+
+
+def test_answer_continuing_a_finalized_session(store):
+    session_id = incremental_scoring.create_session(QUESTION)
+    incremental_scoring.add_chunk(session_id, STREAMED)
+    result, _ = incremental_scoring.finalize(session_id)
+    assert result["user_answer"] == STREAMED
+
+    result, status = incremental_scoring.finalize_for_answer(session_id, ANSWER)
+    assert status == "used"
+    assert result["user_answer"] == ANSWER
+    assert result["detected_keypoints"] == key_det.detect_keypoints({**QUESTION, "user_answer": ANSWER})["detected_keypoints"]
+    assert result["detected_keypoints"] == ["mutable", "ordered"]
+
+def test_answer_matching_a_finalized_session(store):
+    session_id = incremental_scoring.create_session(QUESTION)
+    incremental_scoring.add_chunk(session_id, ANSWER)
+    expected, _ = incremental_scoring.finalize(session_id)
+
+    result, status = incremental_scoring.finalize_for_answer(session_id, "  " + ANSWER)
+    assert status == "used"
+    assert result == expected
+
+def test_chunk_after_finalize_is_rejected(store):
+    session_id = incremental_scoring.create_session(QUESTION)
+    incremental_scoring.add_chunk(session_id, STREAMED)
+    incremental_scoring.finalize(session_id)
+    with pytest.raises(SessionFinalizedError):
+        incremental_scoring.add_chunk(session_id, "It is mutable.")
+
+def test_unknown_and_edited_answers(store):
+    assert incremental_scoring.finalize_for_answer("nope", ANSWER) == (None, "not_found")
+    session_id = incremental_scoring.create_session(QUESTION)
+    incremental_scoring.add_chunk(session_id, STREAMED)
+    assert incremental_scoring.finalize_for_answer(session_id, "A tuple is a collection.") == (None, "mismatch")
+    # the session is closed either way
+    assert incremental_scoring.add_chunk(session_id, "more") is None
+
+
+# every load sees a version another worker just replaced
+@pytest.fixture
+def contended_store(fake_encoder, monkeypatch):
+    store = MongoSessionStore(mongomock.MongoClient()["scoring"]["sessions"])
+    monkeypatch.setattr(incremental_scoring, "store", store)
+    from_state = incremental_scoring.ScoringSession.from_state
+
+    def load_and_race(state):
+        store.collection.update_one({"_id": state["_id"]}, {"$inc": {"version": 1}})
+        return from_state(state)
+
+    session_id = incremental_scoring.create_session(QUESTION)
+    monkeypatch.setattr(incremental_scoring.ScoringSession, "from_state", staticmethod(load_and_race))
+    return store, session_id
+
+def test_update_gives_up_on_conflicts(contended_store):
+    store, session_id = contended_store
+    with pytest.raises(SessionConflictError):
+        incremental_scoring.add_chunk(session_id, STREAMED)
+
+
+@pytest.fixture
+def client(server, store):
+    return server.app.test_client()
+
+def test_routes(client):
+    session_id = client.post("/scoringSession", json=QUESTION).get_json()["session_id"]
+    assert client.post(f"/scoringSession/{session_id}/chunk", json={"text": STREAMED}).status_code == 200
+    assert client.post(f"/scoringSession/{session_id}/finalize").status_code == 200
+
+    response = client.post(f"/scoringSession/{session_id}/chunk", json={"text": "It is mutable."})
+    assert response.status_code == 409
+
+    response = client.post("/getFeedback?mode=fast", json={**QUESTION, "user_answer": ANSWER, "scoring_session_id": session_id})
+    assert response.status_code == 200
+    assert response.headers["X-Scoring-Session"] == "used"
+    assert response.get_json()["detected_keypoints"] == ["mutable", "ordered"]
+
+    response = client.post("/getFeedback?mode=fast", json={**QUESTION, "user_answer": ANSWER, "scoring_session_id": session_id})
+    assert response.headers["X-Scoring-Session"] == "not_found"
+    assert client.post(f"/scoringSession/{session_id}/chunk", json={"text": "x"}).status_code == 404
+
+def test_conflict_route(server, contended_store):
+    _, session_id = contended_store
+    response = server.app.test_client().post(f"/scoringSession/{session_id}/chunk", json={"text": STREAMED})
+    assert response.status_code == 409
@@ -0,0 +1,146 @@
+import glob
+import os
+import time
+import mongomock
+import pytest
+import question_bank
+from question_bank import QuestionBank, QUESTION_COLLECTION
+from util.db import DATASET_DIR, load_files
+
+# question bank over the bundled datasets loaded into mongomock by util/db.py
+#
+#   python -m pytest tests          # from ai-server/
+
+DATASET_PATHS = sorted(glob.glob(os.path.join(DATASET_DIR, "*.json")))
+QUESTIONS_PER_LEVEL = 25 # every bundled dataset has 25 questions per level
+
+
+@pytest.fixture
+def client():
+    client = mongomock.MongoClient()
+    stats = load_files(client["questions"][QUESTION_COLLECTION], DATASET_PATHS)
+    assert stats["questions"] == QUESTIONS_PER_LEVEL * 3 * len(DATASET_PATHS)
+    return client
+
+@pytest.fixture
+def bank(client):
+    return QuestionBank(client, ttl=0)
+
+
+def test_loader_is_idempotent(client):
+    stats = load_files(client["questions"][QUESTION_COLLECTION], DATASET_PATHS)
+    assert stats["upserted"] == 0
+    assert client["questions"][QUESTION_COLLECTION].count_documents({}) == stats["questions"]
+
+def test_has_domain(bank):
+    assert bank.has_domain("python")
+    assert bank.has_domain("javascript")
+    assert not bank.has_domain("cobol")
+    assert not bank.has_domain(None)
+
+def test_sample(bank):
+    questions = bank.sample("python", "beginner", 5)
+    assert len(questions) == 5
+    assert len({question["question_id"] for question in questions}) == 5
+    for question in questions:
+        assert question["question_level"] == "beginner"
+        assert "_id" not in question and "domain" not in question and "level" not in question
+        assert question["question"] and question["keypoints"]
+
+def test_sample_more_than_available(bank):
+    assert len(bank.sample("javascript", "advanced", 1000)) == QUESTIONS_PER_LEVEL
+
+def test_sample_unknown_group(bank):
+    assert bank.sample("python", "expert", 5) is None
+    assert bank.sample("cobol", "beginner", 5) is None
+
+# databases loaded before util/db.py wrote one document per question: a collection per domain
+def test_per_domain_fallback():
+    client = mongomock.MongoClient()
+    client["questions"]["python"].insert_many([
+        {"beginner": [{"question_id": 1, "question": "What is a list?"}, {"question_id": 2, "question": "What is a tuple?"}]},
+        {"advanced": [{"question_id": 3, "question": "What is a metaclass?"}]},
+    ])
+    bank = QuestionBank(client, ttl=0)
+
+    assert bank.has_domain("python")
+    assert sorted(question["question_id"] for question in bank.sample("python", "beginner", 10)) == [1, 2]
+    assert bank.sample("python", "advanced", 10) == [{"question_id": 3, "question": "What is a metaclass?"}]
+
+# other collections of the database (and lists that are not levels) are not question groups
+def test_per_domain_fallback_skips_other_data():
+    client = mongomock.MongoClient()
+    client["questions"]["python"].insert_one({"beginner": [{"question_id": 1, "question": "What is a list?"}]})
+    client["questions"]["scoring_sessions"].insert_one({"transcript": "", "possible_answers": ["a list holds items"], "key_point_max": [0.1]})
+    bank = QuestionBank(client, ttl=0)
+
+    assert bank.has_domain("python")
+    assert not bank.has_domain("scoring_sessions")
+    assert bank.sample("scoring_sessions", "possible_answers", 5) is None
+
+def test_fallback_ignored_when_question_collection_has_data(client):
+    client["questions"]["python"].insert_one({"beginner": [{"question_id": 999, "question": "old copy"}]})
+    bank = QuestionBank(client, ttl=0)
+    assert 999 not in {question["question_id"] for question in bank.sample("python", "beginner", 1000)}
+
+def test_fresh_index_is_not_reloaded(client, monkeypatch):
+    bank = QuestionBank(client, ttl=60)
+    bank.ensure_loaded()
+    monkeypatch.setattr(bank, "reload_async", lambda: pytest.fail("reloaded within the ttl"))
+    bank.sample("python", "beginner", 1)
+
+def test_ttl_triggers_background_reload(client):
+    bank = QuestionBank(client, ttl=60)
+    assert not bank.has_domain("rust")
+    client["questions"][QUESTION_COLLECTION].insert_one(
+        {"domain": "rust", "level": "beginner", "question_id": 1, "question_level": "beginner", "question": "What is ownership?"}
+    )
+
+    # a call on the stale index starts a reload in the background
+    bank.loaded_at -= 61
+    stale_at = bank.loaded_at
+    bank.sample("python", "beginner", 1)
+
+    deadline = time.time() + 5
+    while (bank.reloading or bank.loaded_at == stale_at) and time.time() < deadline:
+        time.sleep(0.01)
+    assert bank.has_domain("rust")
+    assert bank.sample("rust", "beginner", 1)[0]["question"] == "What is ownership?"
+
+def test_reload_async_runs_one_reload_at_a_time(bank, monkeypatch):
+    started = []
+    monkeypatch.setattr(question_bank.threading, "Thread", lambda **kwargs: started.append(kwargs) or FakeThread())
+    bank.reload_async()
+    bank.reload_async()
+    assert len(started) == 1
+
+class FakeThread:
+    def start(self):
+        pass
+
+
+@pytest.fixture
+def server_client(server, bank, monkeypatch):
+    monkeypatch.setattr(server, "question_bank", bank)
+    return server.app.test_client()
+
+def test_fetch_questions(server_client):
+    response = server_client.get("/fetchQuestions?technicalDomain=python&questionLevel=intermediate&noOfQuestions=3")
+    assert response.status_code == 200
+    assert [question["question_level"] for question in response.get_json()] == ["intermediate"] * 3
+
+def test_fetch_questions_unknown_domain(server_client):
+    response = server_client.get("/fetchQuestions?technicalDomain=cobol&questionLevel=beginner&noOfQuestions=3")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "There is no such question category"}
+
+@pytest.mark.parametrize("level", ["expert", ""])
+def test_fetch_questions_unknown_level(server_client, level):
+    response = server_client.get(f"/fetchQuestions?technicalDomain=python&questionLevel={level}&noOfQuestions=3")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "There is no such question level!!"}
+
+def test_fetch_questions_without_level(server_client):
+    response = server_client.get("/fetchQuestions?technicalDomain=python&noOfQuestions=3")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "There is no such question level!!"}
@@ -1,21 +1,110 @@
-from pymongo import MongoClient
+import argparse
+import glob
 import os
+import time
 from dotenv import load_dotenv
-import json
+import ijson
+from pymongo import ASCENDING, MongoClient, UpdateOne
+
+# load the question datasets into mongodb
+#
+#   python db.py                          # every file in ./question_dataset
+#   python db.py question_dataset/python.json --domain python
+#
+# files are stream-parsed, so they never have to fit in memory. every question becomes one document
+# keyed by (domain, level, question_id) and is upserted, so running the loader again updates the
+# questions instead of duplicating them. the domain defaults to the file name (python.json -> python).
 
 load_dotenv()
 
-client = MongoClient("mongodb://localhost:27017/")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(BASE_DIR, "question_dataset")
+QUESTION_COLLECTION = "question_bank" # same collection question_bank.py reads
+
+# yield (level, question) pairs from a dataset file shaped like [{"beginner": [question, ...]}, ...]
+def iter_questions(path):
+    with open(path, "rb") as file:
+        builder = None
+        for prefix, event, value in ijson.parse(file):
+            if builder is None:
+                parts = prefix.split(".")
+                # a question object starts at item.<level>.item
+                if event == "start_map" and len(parts) == 3 and parts[0] == "item" and parts[2] == "item":
+                    level = parts[1]
+                    question_prefix = prefix
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+            else:
+                builder.event(event, value)
+                if event == "end_map" and prefix == question_prefix:
+                    yield level, builder.value
+                    builder = None
+
+# one document per question
+def normalize_question(domain, level, question):
+    doc = dict(question)
+    doc["domain"] = domain
+    doc["level"] = doc.get("question_level", level)
+    doc.setdefault("question_level", doc["level"])
+    return doc
+
+# create the indexes the fetch path needs (the unique key also serves (domain, level) lookups)
+def create_indexes(collection):
+    collection.create_index(
+        [("domain", ASCENDING), ("level", ASCENDING), ("question_id", ASCENDING)],
+        unique=True,
+        name="domain_level_question_id",
+    )
+
+# upsert one batch, duplicates inside the batch keep the last occurrence
+def write_batch(collection, batch, stats):
+    operations = [
+        UpdateOne({"domain": key[0], "level": key[1], "question_id": key[2]}, {"$set": doc}, upsert=True)
+        for key, doc in batch.items()
+    ]
+    result = collection.bulk_write(operations, ordered=False)
+    stats["upserted"] += result.upserted_count
+    stats["modified"] += result.modified_count
+    stats["matched"] += result.matched_count
+    batch.clear()
 
-db = client["questions"]
+def load_files(collection, paths, domain=None, batch_size=1000):
+    stats = {"files": 0, "questions": 0, "upserted": 0, "modified": 0, "matched": 0}
+    started = time.perf_counter()
 
-collection = db["python"]
+    create_indexes(collection)
+    batch = {}
+    for path in paths:
+        file_domain = domain or os.path.splitext(os.path.basename(path))[0]
+        stats["files"] += 1
+        for level, question in iter_questions(path):
+            doc = normalize_question(file_domain, level, question)
+            batch[(doc["domain"], doc["level"], doc["question_id"])] = doc
+            stats["questions"] += 1
+            if len(batch) >= batch_size:
+                write_batch(collection, batch, stats)
+        if batch:
+            write_batch(collection, batch, stats)
 
-with open("./question_dataset/javascript.json", "r") as file:
-    data = json.load(file)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["questions_per_second"] = round(stats["questions"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
 
-collection.insert_many(data)
 
-print("Success")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load question datasets into mongodb")
+    parser.add_argument("files", nargs="*", help="dataset files (default: every file in question_dataset/)")
+    parser.add_argument("--domain", help="domain for every file (default: file name)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default="questions")
+    parser.add_argument("--collection", default=QUESTION_COLLECTION)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
 
+    paths = args.files or sorted(glob.glob(os.path.join(DATASET_DIR, "*.json")))
+    client = MongoClient(args.mongo_uri)
+    stats = load_files(client[args.db][args.collection], paths, args.domain, args.batch_size)
 
+    print(f"Loaded {stats['questions']} questions from {stats['files']} files in {stats['seconds']}s "
+          f"({stats['questions_per_second']} questions/s): {stats['upserted']} new, "
+          f"{stats['modified']} updated, {stats['matched'] - stats['modified']} unchanged")
@@ -1,7 +1,10 @@
 import React, { useEffect, useRef } from "react";
 
-const FacialAnalysis = ({ onUpdate }) => {
-  const WS_URL = "ws://localhost:8000/ws";
+const FacialAnalysis = ({ onUpdate, sessionId }) => {
+  // the session id lets the server keep one running summary across reconnects
+  const WS_URL = sessionId
+    ? `ws://localhost:8000/ws?session_id=${encodeURIComponent(sessionId)}`
+    : "ws://localhost:8000/ws";
 
   const videoRef = useRef(null);
   const wsRef = useRef(null);
@@ -119,8 +122,12 @@ const FacialAnalysis = ({ onUpdate }) => {
       const ctx = canvas.getContext("2d");
 
       ctx.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
-      const dataUrl = canvas.toDataURL("image/jpeg", 0.6);
-      wsRef.current.send(dataUrl);
+      // send the jpeg as a binary frame (no base64 overhead)
+      canvas.toBlob((blob) => {
+        if (blob && wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+          wsRef.current.send(blob);
+        }
+      }, "image/jpeg", 0.6);
     } catch (e) {
       console.warn("sendFrame error", e);
     }
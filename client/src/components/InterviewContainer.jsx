@@ -302,8 +302,18 @@ const InterviewContainer = () => {
             // adding nonverbal feedback
             console.log("Computing Non Verbal Metrics");
             const nonVerbalMetrics = computeMetrics(stateCountRef.current, metrics)
+
+            // compact summary of the whole session kept by the facial analysis server
+            let sessionSummary = null
+            try {
+                const summaryResponse = await axios.get(`http://localhost:8000/session/${interviewSessionId}/summary`)
+                sessionSummary = summaryResponse.data
+            } catch (error) {
+                console.warn("Session summary not available, sending metrics only");
+            }
+
             console.log("Getting Feedback on Non Verbal Metrics");
-            const nonVerbalResponse = await axios.post("http://127.0.0.1:5000/getFacialFeedback", {nonVerbalMetrics}, {
+            const nonVerbalResponse = await axios.post("http://127.0.0.1:5000/getFacialFeedback", sessionSummary ? {sessionSummary} : {nonVerbalMetrics}, {
                 headers: "application/json"
             } )
 
@@ -473,7 +483,7 @@ const InterviewContainer = () => {
                         {/* Right Card */}
                         <div className=" flex flex-col justify-between gap-4 w-full ">
                             <div className="outline-1 rounded-md outline-gray-400/50 bg-neutral-100/80 text-black/80 shadow-md">
-                                <FacialAnalysis onUpdate={handleFacialAnaylsis} />
+                                <FacialAnalysis onUpdate={handleFacialAnaylsis} sessionId={interviewSessionId} />
                             </div>
 
                             <div className="flex flex-col gap-2 justify-center items-center h-30 outline-1 rounded-md outline-gray-400/50 bg-neutral-100/80 text-black/80">